@@ -0,0 +1,53 @@
+"""
+Kernel numba per gli indicatori condivisi da scoring system e data pipeline
+"""
+import numpy as np
+from src.utils._njit import njit
+
+
+@njit('UniTuple(float64, 2)(float64[:], int64, int64)', cache=True)
+def _gain_loss(prices, start, stop):
+    """Somme di rialzi e ribassi dei delta prices[start+1:stop]"""
+    gain = 0.0
+    loss = 0.0
+    for i in range(start + 1, stop):
+        d = prices[i] - prices[i - 1]
+        gain += max(d, 0.0)
+        loss += max(-d, 0.0)
+    return gain, loss
+
+
+@njit('float64(float64[:], int64)', cache=True)
+def _rsi_njit(prices, period):
+    """RSI sugli ultimi `period` delta in un singolo passaggio"""
+    n = prices.shape[0]
+    start = max(n - period - 1, 0)
+    if n - 1 - start <= 0:
+        return 50.0
+
+    gain, loss = _gain_loss(prices, start, n)
+    if loss == 0.0:
+        return 100.0
+
+    rs = gain / loss
+    return 100.0 - (100.0 / (1.0 + rs))
+
+
+@njit('float64[:](float64[:], int64)', cache=True)
+def _rolling_rsi(prices, period):
+    """
+    RSI su finestra mobile, come rolling mean di pandas: NaN sulle prime
+    `period` barre e sulle finestre piatte (rialzi e ribassi nulli).
+    Loop seriale: il thread pool di numba parallel non e' fork-safe e
+    bloccherebbe i worker del DataLoader
+    """
+    n = prices.shape[0]
+    out = np.full(n, np.nan)
+    for i in range(period, n):
+        gain, loss = _gain_loss(prices, i - period, i + 1)
+        if loss == 0.0:
+            if gain > 0.0:
+                out[i] = 100.0
+        else:
+            out[i] = 100.0 - (100.0 / (1.0 + gain / loss))
+    return out
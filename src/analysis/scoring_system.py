@@ -7,120 +7,632 @@ Integra:
 - Sentiment analysis
 """
 import numpy as np
-from typing import Dict, Optional
+import torch
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import cache
+from typing import Dict, Hashable, List, Optional
+from src.utils._njit import njit, prange
+from src.analysis.indicators import _rsi_njit
 from src.models.transformer import TradingTransformer
 from src.risk.manager import RiskManager
 
+
+@njit('UniTuple(float64, 5)(float64[:], float64[:])', cache=True)
+def _tech_score_kernel(prices, volumes):
+    """
+    Calcola in un solo passaggio a ritroso RSI(14), media volumi (20),
+    volume corrente, SMA 20 e SMA 50
+    """
+    n = prices.shape[0]
+    m = volumes.shape[0]
+    period = 14
+
+    sum20 = 0.0
+    sum50 = 0.0
+    vol_sum = 0.0
+    gain = 0.0
+    loss = 0.0
+
+    for k in range(max(50, period + 1)):
+        i = n - 1 - k
+        if i >= 0:
+            p = prices[i]
+            if k < 20:
+                sum20 += p
+            if k < 50:
+                sum50 += p
+            if k < period and i > 0:
+                d = p - prices[i - 1]
+                gain += max(d, 0.0)
+                loss += max(-d, 0.0)
+        j = m - 1 - k
+        if k < 20 and j >= 0:
+            vol_sum += volumes[j]
+
+    if n < 2:
+        rsi = 50.0
+    elif loss == 0.0:
+        rsi = 100.0
+    else:
+        rsi = 100.0 - (100.0 / (1.0 + gain / loss))
+
+    return (rsi,
+            vol_sum / min(m, 20),
+            volumes[m - 1],
+            sum20 / min(n, 20),
+            sum50 / min(n, 50))
+
+
+@njit('float64(float64, float64, float64)', cache=True)
+def _trend_score_njit(current_price, sma_20, sma_50):
+    """Classifica il trend a partire da prezzo corrente e medie mobili"""
+    if current_price > sma_20 and sma_20 > sma_50:
+        return 1.0  # Strong uptrend
+    elif current_price < sma_20 and sma_20 < sma_50:
+        return 0.0  # Strong downtrend
+    return 0.5  # Sideways
+
+
+@njit('float64(float64, float64, float64, float64, float64, float64)', cache=True)
+def _technical_score_njit(current_price, rsi, vol_avg, vol_current, sma_20, sma_50):
+    """Combina RSI, volume e trend nello score tecnico 0-1"""
+    # RSI
+    if rsi < 30:
+        rsi_score = 1.0
+    elif rsi > 70:
+        rsi_score = 0.0
+    else:
+        rsi_score = 0.5
+
+    # Volume Analysis
+    volume_score = 1.0 if vol_current > vol_avg * 1.5 else 0.5
+
+    # Trend Analysis
+    trend_score = _trend_score_njit(current_price, sma_20, sma_50)
+
+    return rsi_score * 0.3 + volume_score * 0.3 + trend_score * 0.4
+
+
+# Codici azione restituiti da _combine_kernel
+_ACTIONS = ('WAIT', 'BUY', 'SELL')
+
+
+@njit('Tuple((int64, float64, float64, float64, float64, float64))'
+      '(float64, float64, float64, float64, float64, float64, float64, float64, float64)',
+      cache=True)
+def _combine_kernel(price, predicted_price, confidence, volatility,
+                    technical_score, risk_score,
+                    conf_thresh, min_rr, risk_per_trade):
+    """
+    Combina i segnali e calcola la size della posizione.
+    Restituisce (azione, confidence, target, stop loss, risk/reward, size)
+    con azione 0=WAIT, 1=BUY, 2=SELL; target e stop sono NaN se non si trada
+    """
+    # Calcola la direzione prevista
+    price_change = (predicted_price - price) / price
+
+    # Se confidence troppo bassa, non tradare
+    if confidence < conf_thresh:
+        return 0, confidence, np.nan, np.nan, 0.0, 0.0
+
+    # Stop loss basato su volatilità, target basato su R:R minimo
+    if price_change > 0:
+        stop_loss = price * (1 - volatility)
+    else:
+        stop_loss = price * (1 + volatility)
+    risk = abs(price - stop_loss)
+    if price_change > 0:
+        target = price + risk * min_rr
+    else:
+        target = price - risk * min_rr
+
+    risk_reward = abs(target - price) / abs(stop_loss - price)
+
+    # risk_score è 0-100
+    final_score = confidence * 0.3 + technical_score * 0.3 + (risk_score / 100) * 0.4
+
+    if price_change > volatility and final_score > 0.7:
+        action = 1
+    elif price_change < -volatility and final_score > 0.7:
+        action = 2
+    else:
+        action = 0
+
+    # Size della posizione basata su risk management
+    risk_amount = 100 * (risk_per_trade * (risk_score / 100))
+    position_size = risk_amount / abs(price - stop_loss)
+
+    return action, final_score, target, stop_loss, risk_reward, position_size
+
+
+# I kernel paralleli avviano il threading layer di numba, che non e'
+# fork-safe: niente firma esplicita ne' _warmup, cosi' il layer parte solo al
+# primo uso e non all'import, prima di un eventuale fork del processo
+@njit(parallel=True, cache=True)
+def _batch_technical_scores(prices, volumes):
+    """Score tecnico per ogni riga (simbolo) delle matrici (S, N)"""
+    num_symbols = prices.shape[0]
+    out = np.empty(num_symbols)
+    for s in prange(num_symbols):
+        rsi, vol_avg, vol_current, sma_20, sma_50 = _tech_score_kernel(prices[s], volumes[s])
+        out[s] = _technical_score_njit(prices[s, -1], rsi, vol_avg, vol_current, sma_20, sma_50)
+    return out
+
+
+@njit(parallel=True, cache=True)
+def _batch_combine(prices, predicted, confidence, volatility, technical, risk,
+                   conf_thresh, min_rr, risk_per_trade, out_actions, out_values):
+    """
+    _combine_kernel su tutti i simboli. out_values ha colonne
+    (confidence, target, stop loss, risk/reward, size)
+    """
+    for s in prange(prices.shape[0]):
+        action, score, target, stop_loss, risk_reward, size = _combine_kernel(
+            prices[s], predicted[s], confidence[s], volatility[s],
+            technical[s], risk[s], conf_thresh, min_rr, risk_per_trade
+        )
+        out_actions[s] = action
+        out_values[s, 0] = score
+        out_values[s, 1] = target
+        out_values[s, 2] = stop_loss
+        out_values[s, 3] = risk_reward
+        out_values[s, 4] = size
+
+
+@dataclass(slots=True, frozen=True)
+class Signal:
+    """Decisione di trading prodotta da _combine_signals"""
+    action: str
+    confidence: float
+    target_price: Optional[float]
+    stop_loss: Optional[float]
+    risk_reward: float
+    position_size: float
+
+
+@dataclass(slots=True, frozen=True)
+class SignalAnalysis:
+    """
+    Componenti che hanno contribuito al segnale. Transformer e risk score
+    sono None quando lo score tecnico ha scartato il segnale in anticipo
+    """
+    transformer_confidence: Optional[float]
+    technical_score: float
+    risk_score: Optional[float]
+    volatility: Optional[float]
+
+
+@dataclass(slots=True, frozen=True)
+class SignalWithAnalysis:
+    """Segnale completo restituito da generate_signal"""
+    symbol: str
+    signal: Signal
+    analysis: SignalAnalysis
+
+    def to_dict(self) -> Dict:
+        """Serializza nel formato dict usato ai confini dell'applicazione"""
+        return {
+            'symbol': self.symbol,
+            'signal': self.signal.action,
+            'confidence': self.signal.confidence,
+            'target_price': self.signal.target_price,
+            'stop_loss': self.signal.stop_loss,
+            'risk_reward': self.signal.risk_reward,
+            'position_size': self.signal.position_size,
+            'analysis': {
+                'transformer_confidence': self.analysis.transformer_confidence,
+                'technical_score': self.analysis.technical_score,
+                'risk_score': self.analysis.risk_score,
+                'volatility': self.analysis.volatility
+            }
+        }
+
+
+class _BarStream:
+    """
+    Ring buffer degli ultimi 50 prezzi e 20 volumi con somme mobili:
+    aggiungere una barra aggiorna SMA 20/50 e media volumi in O(1)
+    """
+    def __init__(self):
+        self.prices = np.zeros(50)
+        self.volumes = np.zeros(20)
+        self.count = 0
+        self.sum20 = 0.0
+        self.sum50 = 0.0
+        self.vol_sum = 0.0
+        # Timestamp dell'ultima barra aggiunta
+        self.last_bar: Hashable = None
+
+    @property
+    def warm(self) -> bool:
+        return self.count >= 50
+
+    @property
+    def last(self) -> tuple:
+        """(prezzo, volume) dell'ultima barra aggiunta"""
+        return (float(self.prices[(self.count - 1) % 50]),
+                float(self.volumes[(self.count - 1) % 20]))
+
+    def push(self, price: float, volume: float):
+        """Aggiunge una barra chiusa, togliendo quelle uscite dalle finestre"""
+        i50 = self.count % 50
+        i20 = self.count % 20
+        if self.count >= 50:
+            self.sum50 -= self.prices[i50]
+        if self.count >= 20:
+            self.sum20 -= self.prices[(self.count - 20) % 50]
+            self.vol_sum -= self.volumes[i20]
+
+        self.prices[i50] = price
+        self.volumes[i20] = volume
+        self.sum20 += price
+        self.sum50 += price
+        self.vol_sum += volume
+        self.count += 1
+
+        # Ricalcolo periodico per non accumulare errori di arrotondamento
+        if self.count % 50 == 0:
+            self.sum50 = self.prices.sum()
+            self.sum20 = self.prices[np.arange(self.count - 20, self.count) % 50].sum()
+            self.vol_sum = self.volumes.sum()
+
+    def seed(self, prices: np.ndarray, volumes: np.ndarray):
+        """
+        Inizializza un buffer vuoto dallo storico disponibile: somme calcolate
+        direttamente sulle code, stesso stato di push barra per barra
+        """
+        count = min(50, len(prices), len(volumes))
+        tail_prices = np.asarray(prices[len(prices) - count:], dtype=np.float64)
+        tail_volumes = np.asarray(volumes[len(volumes) - count:], dtype=np.float64)
+        n20 = min(count, 20)
+
+        self.prices[:count] = tail_prices
+        self.volumes[np.arange(count - n20, count) % 20] = tail_volumes[count - n20:]
+        self.count = count
+        self.sum50 = float(tail_prices.sum())
+        self.sum20 = float(tail_prices[count - n20:].sum())
+        self.vol_sum = float(tail_volumes[count - n20:].sum())
+
+
+@cache
+def _warmup():
+    """
+    Esegue una volta per processo ogni kernel con firma esplicita su dati
+    fittizi, cosi' il primo segnale reale non paga il caricamento dalla
+    cache o la compilazione JIT. Chiamato da SignalScorer.__init__, non
+    all'import del modulo
+    """
+    prices = np.linspace(100.0, 101.0, 60)
+    volumes = np.ones(60)
+    _rsi_njit(prices, 14)
+    _tech_score_kernel(prices, volumes)
+    _combine_kernel(100.0, 101.0, 0.8, 0.01, 0.5, 50.0, 0.7, 2.0, 0.02)
+
+
 class SignalScorer:
     def __init__(self, 
                  confidence_threshold: float = 0.7,
                  min_risk_reward: float = 2.0,
-                 max_portfolio_risk: float = 0.02):  # 2% max risk per trade
+                 max_portfolio_risk: float = 0.02,  # 2% max risk per trade
+                 skip_transformer_below: float = 0.4,
+                 sequence_length: int = 60,
+                 forward_cache_size: int = 128,
+                 compile_transformer: bool = False):
         
+        _warmup()
+        # Pesi non addestrati e input segnaposto: vedi _placeholder_input
         self.transformer = TradingTransformer(input_size=10)  # preset features
+        # Solo inferenza: dropout disattivato
+        self.transformer.eval()
+        if compile_transformer:
+            # Grafo unico con seq_len dinamico: nessuna ricompilazione per lunghezza.
+            # reduce-overhead usa CUDA graphs; su CPU basta la fusione di Inductor
+            mode = 'reduce-overhead' if torch.cuda.is_available() else 'default'
+            self.transformer = torch.compile(
+                self.transformer, mode=mode, fullgraph=True, dynamic=True
+            )
         self.risk_manager = RiskManager({
             'risk_per_trade': max_portfolio_risk,
             'max_portfolio_risk': max_portfolio_risk * 3
         })
         self.confidence_threshold = confidence_threshold
         self.min_risk_reward = min_risk_reward
+        # Sotto questo score tecnico il segnale e' WAIT senza eseguire il transformer
+        self.skip_transformer_below = skip_transformer_below
+        
+        # Buffer streaming per simbolo (SMA e media volumi incrementali)
+        self._streams: Dict[str, _BarStream] = {}
+        
+        # Cache LRU degli output del transformer, chiave = coda dei prezzi
+        self.sequence_length = sequence_length
+        self._fwd_cache: OrderedDict = OrderedDict()
+        self._fwd_cache_size = forward_cache_size
+
+    def _predict(self,
+                 price_data: np.ndarray,
+                 volume_data: np.ndarray,
+                 bar_timestamp: Hashable = None) -> Dict[str, np.ndarray]:
+        """
+        Forward del transformer sugli ultimi sequence_length prezzi e volumi,
+        con memoization: richiamato sulla stessa coda restituisce l'output in
+        cache. La chiave include dtype, shape e byte delle code; bar_timestamp
+        entra nella chiave per distinguere aggiornamenti
+        parziali della stessa barra con prezzi identici.
+        L'input viene da _placeholder_input (vedi li' i limiti); le previsioni
+        di prezzo tornano in scala originale. Restituisce array numpy di
+        forma (prediction_horizon,)
+        """
+        prices = np.asarray(price_data[-self.sequence_length:], dtype=np.float64)
+        volumes = np.asarray(volume_data[-self.sequence_length:], dtype=np.float64)
+        key = (prices.dtype.str, prices.shape, prices.tobytes(),
+               volumes.dtype.str, volumes.shape, volumes.tobytes(), bar_timestamp)
+        
+        prediction = self._fwd_cache.get(key)
+        if prediction is not None:
+            self._fwd_cache.move_to_end(key)
+            return prediction
+        
+        x, price_mean, price_std = self._placeholder_input(prices, volumes)
+        
+        with torch.inference_mode():
+            output = self.transformer(torch.from_numpy(x))
+        
+        prediction = {
+            'price_predictions': output['price_predictions'][0].double().numpy() * price_std + price_mean,
+            'confidence_scores': output['confidence_scores'][0].double().numpy(),
+            'volatility_estimates': output['volatility_estimates'][0].double().numpy()
+        }
+        self._fwd_cache[key] = prediction
+        if len(self._fwd_cache) > self._fwd_cache_size:
+            self._fwd_cache.popitem(last=False)
+        return prediction
+
+    def _placeholder_input(self, prices: np.ndarray, volumes: np.ndarray) -> tuple:
+        """
+        Input segnaposto per il transformer, NON il layout di training:
+        TradingDataset usa close, volume e le feature di add_technical_features
+        con z-score globale per colonna (ScaleParams del train set), mentre qui
+        prezzi e volumi sono normalizzati sulla sola finestra e le altre
+        colonne restano a zero. Lo scorer non riceve high/low ne' i parametri
+        di scaling del training e il transformer non carica pesi addestrati,
+        quindi le previsioni servono solo a far girare la pipeline.
+        Restituisce (x di forma (1, N, input_size), media e std dei prezzi)
+        """
+        price_mean, price_std = prices.mean(), max(prices.std(), 1e-8)
+        x = np.zeros((1, len(prices), self.transformer.input_size), dtype=np.float32)
+        x[0, :, 0] = (prices - price_mean) / price_std
+        x[0, :, 1] = (volumes - volumes.mean()) / max(volumes.std(), 1e-8)
+        return x, price_mean, price_std
+
+    def _assess_risk(self,
+                     price_data: np.ndarray,
+                     volume_data: np.ndarray,
+                     technical_score: float) -> Dict:
+        """
+        Risk score del simbolo. Lo scorer non riceve sentiment esterno ne'
+        posizioni aperte: news e social neutri (0.5), portafoglio vuoto
+        """
+        return self.risk_manager.calculate_risk_score(
+            market_data={'prices': price_data, 'volumes': volume_data},
+            sentiment_data={
+                'news_sentiment': {'score': 0.5},
+                'social_sentiment': {'score': 0.5},
+                'technical_sentiment': {'score': float(technical_score)}
+            },
+            portfolio_data={'positions': {}, 'returns': {}}
+        )
+
+    def update_buffers(self, symbol: str, new_price: float, new_volume: float,
+                       bar_timestamp: Hashable = None) -> _BarStream:
+        """
+        Aggiunge una nuova barra al buffer del simbolo. Va chiamato una
+        sola volta per barra chiusa
+        """
+        stream = self._streams.setdefault(symbol, _BarStream())
+        stream.push(float(new_price), float(new_volume))
+        stream.last_bar = bar_timestamp
+        return stream
+
+    def _get_stream(self,
+                    symbol: str,
+                    price_data: np.ndarray,
+                    volume_data: np.ndarray,
+                    bar_timestamp: Hashable = None) -> Optional[_BarStream]:
+        """
+        Buffer del simbolo allineato alla coda di price_data: invariato se la
+        barra e' gia' registrata, +1 barra se price_data avanza di una,
+        altrimenti reinizializzato dallo storico.
+        None (lo score tecnico usa il kernel sulla coda) senza bar_timestamp,
+        perche' una chiamata ripetuta non si distingue da una barra nuova, e
+        per un aggiornamento parziale della barra gia' registrata
+        """
+        if bar_timestamp is None:
+            return None
+
+        latest = (float(price_data[-1]), float(volume_data[-1]))
+        stream = self._streams.get(symbol)
+        if stream is not None and stream.count:
+            if stream.last_bar == bar_timestamp:
+                return stream if stream.last == latest else None
+            elif (len(price_data) >= 2
+                  and stream.last == (float(price_data[-2]), float(volume_data[-2]))):
+                return self.update_buffers(symbol, *latest, bar_timestamp)
+
+        stream = self._streams[symbol] = _BarStream()
+        stream.seed(price_data, volume_data)
+        stream.last_bar = bar_timestamp
+        return stream
+
+    @staticmethod
+    def _skipped_signal(symbol: str, technical_score: float) -> SignalWithAnalysis:
+        """WAIT per score tecnico sotto soglia: transformer e risk non eseguiti"""
+        return SignalWithAnalysis(
+            symbol=symbol,
+            signal=Signal(
+                action='WAIT',
+                confidence=0.0,
+                target_price=None,
+                stop_loss=None,
+                risk_reward=0,
+                position_size=0
+            ),
+            analysis=SignalAnalysis(
+                transformer_confidence=None,
+                technical_score=technical_score,
+                risk_score=None,
+                volatility=None
+            )
+        )
 
     async def generate_signal(self, 
                             symbol: str,
                             price_data: np.ndarray,
                             volume_data: np.ndarray,
-                            additional_features: Dict = None) -> Dict:
+                            additional_features: Dict = None,
+                            bar_timestamp: Hashable = None) -> SignalWithAnalysis:
         """
-        Genera un segnale di trading completo
+        Genera un segnale di trading completo.
+        Il buffer streaming per simbolo e' opzionale: si attiva solo passando
+        bar_timestamp (timestamp della barra corrente); senza, lo score tecnico
+        rilegge ogni volta la coda di price_data
         """
-        # 1. Previsione Transformer
-        transformer_prediction = self.transformer.forward(price_data)
-        predicted_prices = transformer_prediction['price_predictions']
-        confidence = transformer_prediction['confidence_scores']
-        volatility = transformer_prediction['volatility_estimates']
+        # 1. Analisi Tecnica (economica, decide se serve il transformer)
+        stream = self._get_stream(symbol, price_data, volume_data, bar_timestamp)
+        technical_score = self._calculate_technical_score(price_data, volume_data, stream)
 
-        # 2. Analisi Tecnica
-        technical_score = self._calculate_technical_score(price_data, volume_data)
+        if technical_score < self.skip_transformer_below:
+            return self._skipped_signal(symbol, technical_score)
+
+        # 2. Previsione Transformer
+        transformer_prediction = self._predict(price_data, volume_data, bar_timestamp)
+        predicted_price = float(transformer_prediction['price_predictions'][-1])
+        confidence = float(transformer_prediction['confidence_scores'][-1])
+        volatility = float(transformer_prediction['volatility_estimates'][-1])
 
         # 3. Risk Assessment
-        risk_assessment = self.risk_manager.calculate_risk_score(
-            market_data={'prices': price_data, 'volumes': volume_data},
-            sentiment_data={'score': technical_score},
-            portfolio_data={'positions': {}}  # TODO: Add current positions
-        )
+        risk_assessment = self._assess_risk(price_data, volume_data, technical_score)
 
         # 4. Calcola segnale finale
         signal = self._combine_signals(
             price=price_data[-1],
-            predicted_price=predicted_prices[-1],
-            confidence=confidence[-1],
-            volatility=volatility[-1],
+            predicted_price=predicted_price,
+            confidence=confidence,
+            volatility=volatility,
             technical_score=technical_score,
             risk_score=risk_assessment['score']
         )
 
-        return {
-            'symbol': symbol,
-            'signal': signal['action'],
-            'confidence': signal['confidence'],
-            'target_price': signal['target_price'],
-            'stop_loss': signal['stop_loss'],
-            'risk_reward': signal['risk_reward'],
-            'position_size': signal['position_size'],
-            'analysis': {
-                'transformer_confidence': confidence[-1],
-                'technical_score': technical_score,
-                'risk_score': risk_assessment['score'],
-                'volatility': volatility[-1]
-            }
-        }
+        return SignalWithAnalysis(
+            symbol=symbol,
+            signal=signal,
+            analysis=SignalAnalysis(
+                transformer_confidence=confidence,
+                technical_score=technical_score,
+                risk_score=risk_assessment['score'],
+                volatility=volatility
+            )
+        )
+
+    async def generate_signals_batch(self,
+                                     symbols: List[str],
+                                     price_mat: np.ndarray,
+                                     vol_mat: np.ndarray) -> List[SignalWithAnalysis]:
+        """
+        Genera i segnali per una watchlist. price_mat e vol_mat hanno forma
+        (S, N), una riga per simbolo. Score tecnici e combinazione girano in
+        parallelo sui simboli; transformer e risk manager restano seriali e
+        solo per i simboli sopra skip_transformer_below
+        """
+        prices = np.ascontiguousarray(price_mat, dtype=np.float64)
+        volumes = np.ascontiguousarray(vol_mat, dtype=np.float64)
+
+        # 1. Analisi Tecnica (parallela)
+        technical = _batch_technical_scores(prices, volumes)
+        active = np.flatnonzero(technical >= self.skip_transformer_below)
+        num_active = len(active)
+
+        # 2. Transformer e Risk Assessment (seriali)
+        predicted = np.empty(num_active)
+        confidence = np.empty(num_active)
+        volatility = np.empty(num_active)
+        risk = np.empty(num_active)
+        for k, s in enumerate(active.tolist()):
+            prediction = self._predict(prices[s], volumes[s])
+            predicted[k] = prediction['price_predictions'][-1]
+            confidence[k] = prediction['confidence_scores'][-1]
+            volatility[k] = prediction['volatility_estimates'][-1]
+            risk[k] = self._assess_risk(prices[s], volumes[s], technical[s])['score']
+
+        # 3. Segnali finali (paralleli)
+        actions = np.empty(num_active, dtype=np.int64)
+        values = np.empty((num_active, 5))
+        _batch_combine(
+            prices[active, -1], predicted, confidence, volatility, technical[active], risk,
+            self.confidence_threshold, self.min_risk_reward,
+            self.risk_manager.risk_per_trade, actions, values
+        )
+
+        # Simboli scartati dallo score tecnico: WAIT come in generate_signal
+        technical_list = technical.tolist()
+        results = [self._skipped_signal(symbol, tech)
+                   for symbol, tech in zip(symbols, technical_list)]
+        analysis = np.stack([confidence, risk, volatility], axis=1).tolist()
+        for k, s in enumerate(active.tolist()):
+            score, target, stop_loss, risk_reward, size = values[k].tolist()
+            conf, risk_score, vol = analysis[k]
+            results[s] = SignalWithAnalysis(
+                symbol=symbols[s],
+                signal=Signal(
+                    action=_ACTIONS[actions[k]],
+                    confidence=score,
+                    target_price=None if np.isnan(target) else target,
+                    stop_loss=None if np.isnan(stop_loss) else stop_loss,
+                    risk_reward=risk_reward,
+                    position_size=size
+                ),
+                analysis=SignalAnalysis(
+                    transformer_confidence=conf,
+                    technical_score=technical_list[s],
+                    risk_score=risk_score,
+                    volatility=vol
+                )
+            )
+        return results
 
     def _calculate_technical_score(self, 
                                  price_data: np.ndarray, 
-                                 volume_data: np.ndarray) -> float:
+                                 volume_data: np.ndarray,
+                                 stream: Optional[_BarStream] = None) -> float:
         """
         Calcola score basato su indicatori tecnici
         """
-        # RSI
-        rsi = self._calculate_rsi(price_data)
-        rsi_score = 1.0 if rsi < 30 else 0.0 if rsi > 70 else 0.5
-
-        # Volume Analysis
-        vol_avg = np.mean(volume_data[-20:])
-        vol_current = volume_data[-1]
-        volume_score = 1.0 if vol_current > vol_avg * 1.5 else 0.5
-
-        # Trend Analysis
-        trend_score = self._calculate_trend_score(price_data)
+        if stream is not None and stream.warm:
+            # Medie dal buffer streaming, solo l'RSI rilegge la coda dei prezzi
+            rsi = _rsi_njit(np.asarray(price_data[-15:], dtype=np.float64), 14)
+            vol_avg = stream.vol_sum / 20
+            vol_current = volume_data[-1]
+            sma_20 = stream.sum20 / 20
+            sma_50 = stream.sum50 / 50
+        else:
+            rsi, vol_avg, vol_current, sma_20, sma_50 = _tech_score_kernel(
+                np.asarray(price_data, dtype=np.float64),
+                np.asarray(volume_data, dtype=np.float64)
+            )
 
-        return (rsi_score * 0.3 + volume_score * 0.3 + trend_score * 0.4)
+        return _technical_score_njit(
+            float(price_data[-1]), rsi, vol_avg, float(vol_current), sma_20, sma_50
+        )
 
     def _calculate_rsi(self, prices: np.ndarray, period: int = 14) -> float:
         """Calcola il RSI"""
-        deltas = np.diff(prices)
-        gain = np.where(deltas > 0, deltas, 0)
-        loss = np.where(deltas < 0, -deltas, 0)
-        
-        avg_gain = np.mean(gain[-period:])
-        avg_loss = np.mean(loss[-period:])
-        
-        if avg_loss == 0:
-            return 100
-        
-        rs = avg_gain / avg_loss
-        return 100 - (100 / (1 + rs))
+        return _rsi_njit(np.asarray(prices, dtype=np.float64), period)
 
     def _calculate_trend_score(self, prices: np.ndarray) -> float:
         """Analizza il trend"""
-        sma_20 = np.mean(prices[-20:])
-        sma_50 = np.mean(prices[-50:])
-        current_price = prices[-1]
-        
-        if current_price > sma_20 and sma_20 > sma_50:
-            return 1.0  # Strong uptrend
-        elif current_price < sma_20 and sma_20 < sma_50:
-            return 0.0  # Strong downtrend
-        return 0.5  # Sideways
+        return _trend_score_njit(
+            float(prices[-1]), np.mean(prices[-20:]), np.mean(prices[-50:])
+        )
 
     def _combine_signals(self,
                         price: float,
@@ -128,66 +640,22 @@ class SignalScorer:
                         confidence: float,
                         volatility: float,
                         technical_score: float,
-                        risk_score: float) -> Dict:
+                        risk_score: float) -> Signal:
         """
         Combina tutti i segnali per una decisione finale
         """
-        # Calcola la direzione prevista
-        price_change = (predicted_price - price) / price
-        
-        # Se confidence troppo bassa, non tradare
-        if confidence < self.confidence_threshold:
-            return {
-                'action': 'WAIT',
-                'confidence': confidence,
-                'target_price': None,
-                'stop_loss': None,
-                'risk_reward': 0,
-                'position_size': 0
-            }
-
-        # Calcola stop loss basato su volatilità
-        stop_loss = price * (1 - volatility) if price_change > 0 else price * (1 + volatility)
-        
-        # Calcola target basato su R:R minimo
-        risk = abs(price - stop_loss)
-        target = price + (risk * self.min_risk_reward) if price_change > 0 else price - (risk * self.min_risk_reward)
-        
-        # Calcola Risk:Reward
-        risk_reward = abs(target - price) / abs(stop_loss - price)
-        
-        # Combina tutti i fattori per lo score finale
-        final_score = (
-            confidence * 0.3 +
-            technical_score * 0.3 +
-            (risk_score / 100) * 0.4  # risk_score è 0-100
+        action, score, target, stop_loss, risk_reward, position_size = _combine_kernel(
+            float(price), float(predicted_price), float(confidence), float(volatility),
+            float(technical_score), float(risk_score),
+            self.confidence_threshold, self.min_risk_reward,
+            self.risk_manager.risk_per_trade
         )
         
-        # Decidi azione
-        if price_change > volatility and final_score > 0.7:
-            action = 'BUY'
-        elif price_change < -volatility and final_score > 0.7:
-            action = 'SELL'
-        else:
-            action = 'WAIT'
-        
-        return {
-            'action': action,
-            'confidence': final_score,
-            'target_price': target,
-            'stop_loss': stop_loss,
-            'risk_reward': risk_reward,
-            'position_size': self._calculate_position_size(price, stop_loss, risk_score)
-        }
-
-    def _calculate_position_size(self,
-                               price: float,
-                               stop_loss: float,
-                               risk_score: float) -> float:
-        """
-        Calcola la size della posizione basata su risk management
-        """
-        risk_amount = 100 * (self.risk_manager.risk_per_trade * (risk_score / 100))
-        price_risk = abs(price - stop_loss)
-        return risk_amount / price_risk
-    
\ No newline at end of file
+        return Signal(
+            action=_ACTIONS[action],
+            confidence=score,
+            target_price=None if np.isnan(target) else target,
+            stop_loss=None if np.isnan(stop_loss) else stop_loss,
+            risk_reward=risk_reward,
+            position_size=position_size
+        )
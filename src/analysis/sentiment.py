@@ -1,26 +1,46 @@
 """
 Sentiment analysis module
 """
-import requests
+import asyncio
+import threading
+import httpx
+import orjson
 from typing import List, Dict
-from bs4 import BeautifulSoup
+from selectolax.lexbor import LexborHTMLParser
 import praw  # Per Reddit
 from tradingview_ta import TA_Handler  # Per TradingView
+from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 class SentimentAnalysis:
     def __init__(self):
         self.dino_digest_url = "https://www.dinodigest.news/"
         self.brave_search = None
         
-        # Inizializzazione Reddit
-        self.reddit = praw.Reddit(
-            client_id="YOUR_CLIENT_ID",
-            client_secret="YOUR_CLIENT_SECRET",
-            user_agent="your_user_agent"
-        )
+        # Inizializzazione Reddit: praw.Reddit non e' thread-safe, ogni
+        # thread di _analyze_reddit crea e riusa la propria istanza
+        self._reddit_config = {
+            'client_id': "YOUR_CLIENT_ID",
+            'client_secret': "YOUR_CLIENT_SECRET",
+            'user_agent': "your_user_agent"
+        }
+        self._reddit_local = threading.local()
         
         # Inizializzazione TradingView
         self.tv = TA_Handler()
+        
+        # Scoring dei titoli dei post
+        self.vader = SentimentIntensityAnalyzer()
+        
+        # Client HTTP condiviso: connessioni keep-alive riutilizzate tra le richieste
+        self._http = httpx.AsyncClient(
+            http2=True,
+            timeout=5.0,
+            limits=httpx.Limits(max_keepalive_connections=10)
+        )
+    
+    async def aclose(self):
+        """Rilascia il pool di connessioni HTTP"""
+        await self._http.aclose()
     
     async def analyze_sentiment(self, symbol: str, asset_type: str = 'CRYPTO') -> Dict:
         """
@@ -55,13 +75,13 @@ class SentimentAnalysis:
         
         # DinoDigest (per azioni)
         if asset_type == 'STOCK':
-            dino_news = self._get_dino_digest_news(symbol)
+            dino_news = await self._get_dino_digest_news(symbol)
             all_news.extend(dino_news)
             sources.append('DinoDigest')
         
         # Coinbase News (per crypto)
         if asset_type == 'CRYPTO':
-            coinbase_news = self._get_coinbase_news(symbol)
+            coinbase_news = await self._get_coinbase_news(symbol)
             all_news.extend(coinbase_news)
             sources.append('Coinbase')
         
@@ -85,7 +105,7 @@ class SentimentAnalysis:
         """
         Analyze sentiment from Reddit and other social platforms
         """
-        reddit_sentiment = self._analyze_reddit(symbol, asset_type)
+        reddit_sentiment = await self._analyze_reddit(symbol, asset_type)
         
         return {
             'score': reddit_sentiment['score'],
@@ -94,7 +114,7 @@ class SentimentAnalysis:
             'subreddits_analyzed': reddit_sentiment['subreddits']
         }
     
-    def _analyze_reddit(self, symbol: str, asset_type: str) -> Dict:
+    async def _analyze_reddit(self, symbol: str, asset_type: str) -> Dict:
         """
         Analyze Reddit sentiment
         """
@@ -104,18 +124,20 @@ class SentimentAnalysis:
         else:
             subreddits = ['stocks', 'wallstreetbets', 'investing']
         
-        mentions = 0
-        sentiment_sum = 0
+        # praw e' bloccante: una ricerca per subreddit in thread separati
+        results = await asyncio.gather(*(
+            asyncio.to_thread(self._search_subreddit, subreddit_name, symbol)
+            for subreddit_name in subreddits
+        ))
+        titles = [title for subreddit_titles in results for title in subreddit_titles]
+        mentions = len(titles)
         
-        for subreddit_name in subreddits:
-            try:
-                subreddit = self.reddit.subreddit(subreddit_name)
-                for post in subreddit.search(symbol, time_filter='week', limit=100):
-                    mentions += 1
-                    # Implementa qui la logica del sentiment sui post
-                    
-            except Exception as e:
-                print(f"Error analyzing Reddit {subreddit_name}: {e}")
+        # Compound VADER in [-1, 1] riportato in [0, 1] come gli altri score;
+        # VADER valuta un titolo alla volta
+        sentiment_sum = sum(
+            (self.vader.polarity_scores(title)['compound'] + 1.0) / 2.0
+            for title in titles
+        )
         
         return {
             'score': sentiment_sum / max(mentions, 1),
@@ -123,6 +145,25 @@ class SentimentAnalysis:
             'subreddits': subreddits
         }
     
+    def _reddit(self) -> praw.Reddit:
+        """Client Reddit del thread corrente"""
+        reddit = getattr(self._reddit_local, 'reddit', None)
+        if reddit is None:
+            reddit = self._reddit_local.reddit = praw.Reddit(**self._reddit_config)
+        return reddit
+    
+    def _search_subreddit(self, subreddit_name: str, symbol: str) -> List[str]:
+        """Titoli dei post della settimana che citano il simbolo"""
+        try:
+            subreddit = self._reddit().subreddit(subreddit_name)
+            return [
+                post.title
+                for post in subreddit.search(symbol, time_filter='week', limit=100)
+            ]
+        except Exception as e:
+            print(f"Error analyzing Reddit {subreddit_name}: {e}")
+            return []
+    
     async def _analyze_trading_view(self, symbol: str, asset_type: str) -> Dict:
         """
         Get technical analysis from TradingView
@@ -145,20 +186,45 @@ class SentimentAnalysis:
             print(f"Error getting TradingView analysis: {e}")
             return {'score': 0.0, 'indicators': {}}
     
-    def _get_coinbase_news(self, symbol: str) -> List[Dict]:
+    async def _get_coinbase_news(self, symbol: str) -> List[Dict]:
         """
         Get news from Coinbase API
         """
         try:
             url = f"https://api.coinbase.com/v2/prices/{symbol}-USD/news"
-            response = requests.get(url)
+            response = await self._http.get(url)
             if response.status_code == 200:
-                return response.json()
+                return orjson.loads(response.content)
             return []
         except Exception as e:
             print(f"Error fetching Coinbase news: {e}")
             return []
     
+    async def _get_dino_digest_news(self, symbol: str) -> List[Dict]:
+        """
+        Get news from DinoDigest (pagina HTML)
+        """
+        try:
+            response = await self._http.get(self.dino_digest_url)
+            if response.status_code != 200:
+                return []
+            
+            news = []
+            for article in LexborHTMLParser(response.text).css('article'):
+                text = article.text(separator=' ', strip=True)
+                if symbol.upper() not in text.upper():
+                    continue
+                title = article.css_first('h1, h2, h3')
+                link = article.css_first('a[href]')
+                news.append({
+                    'title': title.text(strip=True) if title else text[:200],
+                    'url': link.attributes.get('href') if link else None
+                })
+            return news
+        except Exception as e:
+            print(f"Error fetching DinoDigest news: {e}")
+            return []
+    
     def _convert_tv_recommendation(self, recommendation: str) -> float:
         """
         Convert TradingView recommendation to sentiment score
@@ -1,41 +1,78 @@
 """
 Base broker interface and implementations
 """
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, List, Optional
-from binance.client import Client
+from typing import Dict, List, Optional, Tuple
+from binance import AsyncClient
 
 class BaseBroker(ABC):
     """Abstract base class for broker implementations"""
     
     @abstractmethod
-    def get_price(self, symbol: str) -> float:
+    async def get_price(self, symbol: str) -> float:
         """Get current price for symbol"""
         pass
     
     @abstractmethod
-    def place_order(self, symbol: str, side: str, quantity: float):
+    async def place_order(self, symbol: str, side: str, quantity: float):
         """Place a new order"""
         pass
     
     @abstractmethod
-    def get_balance(self) -> Dict[str, float]:
+    async def get_balance(self) -> Dict[str, float]:
         """Get account balance"""
         pass
 
 class BinanceBroker(BaseBroker):
     """Binance broker implementation"""
     
-    def __init__(self, api_key: str, api_secret: str):
-        self.client = Client(api_key, api_secret)
+    def __init__(self, client: AsyncClient, price_ttl: float = 1.0):
+        self.client = client
+        
+        # Cache prezzi: symbol -> (price, timestamp monotonic).
+        # Nessun lock: gli accessi avvengono sull'event loop senza await intermedi
+        self._price_cache: Dict[str, Tuple[float, float]] = {}
+        self._ttl = price_ttl
     
-    def get_price(self, symbol: str) -> float:
-        ticker = self.client.get_symbol_ticker(symbol=symbol)
-        return float(ticker['price'])
+    @classmethod
+    async def create(cls,
+                     api_key: str,
+                     api_secret: str,
+                     price_ttl: float = 1.0) -> 'BinanceBroker':
+        """Crea il broker aprendo la sessione asincrona verso Binance"""
+        client = await AsyncClient.create(api_key, api_secret)
+        return cls(client, price_ttl)
     
-    def place_order(self, symbol: str, side: str, quantity: float):
+    async def close(self):
+        """Chiude la sessione HTTP del client"""
+        await self.client.close_connection()
+    
+    async def get_price(self, symbol: str) -> float:
+        cached = self._price_cache.get(symbol)
+        if cached is not None and time.monotonic() - cached[1] < self._ttl:
+            return cached[0]
+        
+        ticker = await self.client.get_symbol_ticker(symbol=symbol)
+        price = float(ticker['price'])
+        self._price_cache[symbol] = (price, time.monotonic())
+        return price
+    
+    async def get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """Prezzi di piu' simboli con una sola richiesta"""
+        tickers = await self.client.get_all_tickers()
+        now = time.monotonic()
+        
+        # Il risultato viene solo dalla risposta appena ricevuta: un simbolo
+        # assente non deve ricadere su un prezzo in cache di eta' arbitraria
+        fresh = {ticker['symbol']: float(ticker['price']) for ticker in tickers}
+        for symbol, price in fresh.items():
+            self._price_cache[symbol] = (price, now)
+        return {symbol: fresh[symbol] for symbol in symbols if symbol in fresh}
+    
+    async def place_order(self, symbol: str, side: str, quantity: float):
         try:
-            order = self.client.create_order(
+            order = await self.client.create_order(
                 symbol=symbol,
                 side=side,
                 type='MARKET',
@@ -46,11 +83,10 @@ class BinanceBroker(BaseBroker):
             print(f"Error placing order: {e}")
             return None
     
-    def get_balance(self) -> Dict[str, float]:
-        account = self.client.get_account()
+    async def get_balance(self) -> Dict[str, float]:
+        account = await self.client.get_account()
         return {
             b['asset']: float(b['free']) 
             for b in account['balances'] 
             if float(b['free']) > 0
         }
-    
\ No newline at end of file
@@ -1,12 +1,13 @@
 """
 Main entry point for the trading assistant
+Da eseguire dalla root del repository: python -m src.main
 """
 import os
 import asyncio
-from config.settings import Settings
-from core.broker import BinanceBroker
-from analysis.sentiment import SentimentAnalysis
-from risk.manager import RiskManager
+from src.config.settings import Settings
+from src.core.broker import BinanceBroker
+from src.analysis.sentiment import SentimentAnalysis
+from src.risk.manager import RiskManager
 
 async def get_market_data(symbol: str) -> dict:
     """
@@ -41,7 +42,10 @@ async def analyze_trade_risk(symbol: str):
     
     # Ottieni dati
     market_data = await get_market_data(symbol)
-    sentiment_data = await sentiment_analyzer.analyze_sentiment(symbol)
+    try:
+        sentiment_data = await sentiment_analyzer.analyze_sentiment(symbol)
+    finally:
+        await sentiment_analyzer.aclose()
     portfolio_data = await get_portfolio_data()
     
     # Analizza rischio
@@ -68,7 +72,7 @@ async def analyze_trade_risk(symbol: str):
 
 async def main():
     # Inizializza broker
-    broker = BinanceBroker(
+    broker = await BinanceBroker.create(
         api_key=Settings.BINANCE_API_KEY,
         api_secret=Settings.BINANCE_SECRET_KEY
     )
@@ -79,7 +83,7 @@ async def main():
         symbol = 'BTCUSDT'
         
         # Ottieni prezzo corrente
-        btc_price = broker.get_price(symbol)
+        btc_price = await broker.get_price(symbol)
         print(f"\nCurrent BTC Price: {btc_price} USDT")
         
         # Analizza rischio
@@ -91,13 +95,15 @@ async def main():
         print(f"Adjusted Risk: {risk_analysis['adjusted_risk']['adjusted_risk']:.2%}")
         
         # Mostra saldi account
-        balances = broker.get_balance()
+        balances = await broker.get_balance()
         print("\nAccount Balances:")
         for asset, amount in balances.items():
             print(f"{asset}: {amount}")
             
     except Exception as e:
         print(f"\nError: {e}")
+    finally:
+        await broker.close()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -2,74 +2,130 @@
 Data pipeline for the Transformer model
 Handles data preprocessing, batching, and feature engineering
 """
+import os
+import bottleneck as bn
 import numpy as np
 import pandas as pd
 import torch
-from typing import Dict, Tuple, List
-from sklearn.preprocessing import StandardScaler
+from dataclasses import dataclass
+from typing import Dict, Tuple, List, Optional
 from torch.utils.data import Dataset, DataLoader
+from src.utils._njit import njit
+from src.analysis.indicators import _rolling_rsi
+
+
+@njit('float64[:](float64[:], float64)', cache=True)
+def _ewm(x, alpha):
+    """EMA ricorsiva, equivalente a pandas ewm(adjust=False)"""
+    out = np.empty_like(x)
+    if x.shape[0] == 0:
+        return out
+    out[0] = x[0]
+    for i in range(1, x.shape[0]):
+        out[i] = alpha * x[i] + (1.0 - alpha) * out[i - 1]
+    return out
+
+
+@dataclass
+class ScaleParams:
+    """Media e deviazione standard per colonna (stessi attributi di StandardScaler)"""
+    mean_: np.ndarray
+    scale_: np.ndarray
+
+    def transform(self, x: np.ndarray) -> np.ndarray:
+        return (x - self.mean_) / self.scale_
+
+    def inverse_transform(self, x: np.ndarray) -> np.ndarray:
+        return x * self.scale_ + self.mean_
 
 class TradingDataset(Dataset):
     def __init__(self, 
                  data: pd.DataFrame,
                  sequence_length: int = 60,  # 60 minuti di storico
                  prediction_horizon: int = 5,  # 5 minuti in avanti
-                 features: List[str] = None):
+                 features: List[str] = None,
+                 dtype: torch.dtype = torch.float32):
         """
         Parameters:
             data: DataFrame con timestamp index e colonne per features
             sequence_length: Lunghezza della sequenza di input
             prediction_horizon: Quanti step avanti predire
             features: Lista delle feature da usare (oltre a price e volume)
+            dtype: Tipo dei tensori finali (es. torch.bfloat16)
         """
         self.sequence_length = sequence_length
         self.prediction_horizon = prediction_horizon
         
-        # Preprocessing
-        self.price_scaler = StandardScaler()
-        self.volume_scaler = StandardScaler()
-        self.feature_scaler = StandardScaler()
-        
         # Prepara i dati
-        self.data = self._prepare_data(data, features)
-        
-    def _prepare_data(self, data: pd.DataFrame, features: List[str]) -> torch.Tensor:
-        """Prepara e scala i dati"""
-        # Estrai prezzi e volumi
-        prices = self.price_scaler.fit_transform(data[['close']].values)
-        volumes = self.volume_scaler.fit_transform(data[['volume']].values)
-        
-        # Prepara feature tecniche
-        if features:
-            technical_features = self.feature_scaler.fit_transform(data[features].values)
-            # Concatena tutto
-            all_features = np.concatenate([
-                prices,
-                volumes,
-                technical_features
-            ], axis=1)
-        else:
-            all_features = np.concatenate([prices, volumes], axis=1)
+        self.data = self._prepare_data(data, features, dtype)
+        
+        # Prezzi in un tensore 1D contiguo: i target leggono solo questa colonna
+        self.prices_1d = self.data[:, 0].contiguous()
+        
+        # Finestre scorrevoli come viste strided, senza copie.
+        # Le viste condividono lo storage di data/prices_1d: sono in sola lettura
+        num_samples = max(len(self.data) - sequence_length - prediction_horizon, 0)
+        num_columns = self.data.shape[1]
+        self.windows = self.data.as_strided(
+            size=(num_samples, sequence_length, num_columns),
+            stride=(num_columns, num_columns, 1)
+        )
+        self.targets = self.prices_1d[sequence_length:].as_strided(
+            size=(num_samples, prediction_horizon),
+            stride=(1, 1)
+        )
+        
+    def _prepare_data(self,
+                      data: pd.DataFrame,
+                      features: List[str],
+                      dtype: torch.dtype = torch.float32) -> torch.Tensor:
+        """Prepara e scala i dati (z-score per colonna in un solo passaggio)"""
+        # Colonne: prezzo, volume, feature tecniche, gia' in float32
+        columns = ['close', 'volume'] + list(features or [])
+        raw = np.ascontiguousarray(data[columns].to_numpy(dtype=np.float32))
+        
+        mean = raw.mean(axis=0, keepdims=True)
+        std = raw.std(axis=0, keepdims=True)
+        std[std == 0] = 1.0
+        scaled = (raw - mean) / std
+        
+        self._scale_mean = mean[0]
+        self._scale_std = std[0]
+        self.price_scaler = ScaleParams(self._scale_mean[:1], self._scale_std[:1])
+        self.volume_scaler = ScaleParams(self._scale_mean[1:2], self._scale_std[1:2])
+        self.feature_scaler = ScaleParams(self._scale_mean[2:], self._scale_std[2:])
             
-        return torch.FloatTensor(all_features)
+        # from_numpy non copia; la conversione a dtype avviene dopo lo scaling
+        tensor = torch.from_numpy(scaled)
+        return tensor if dtype == torch.float32 else tensor.to(dtype)
+    
+    def inverse_transform(self, col_idx: int, x: np.ndarray) -> np.ndarray:
+        """Riporta i valori scalati della colonna col_idx nella scala originale"""
+        return x * self._scale_std[col_idx] + self._scale_mean[col_idx]
     
     def __len__(self) -> int:
-        return len(self.data) - self.sequence_length - self.prediction_horizon
+        return len(self.windows)
     
     def __getitem__(self, idx: int) -> Tuple[torch.Tensor, torch.Tensor]:
         """
         Returns:
-            x: Input sequence
+            x: Input sequence (vista su self.data, da non modificare)
             y: Target prices for next prediction_horizon steps
         """
-        # Input sequence
-        x = self.data[idx:idx + self.sequence_length]
-        
-        # Target sequence
-        y = self.data[idx + self.sequence_length:
-                     idx + self.sequence_length + self.prediction_horizon, 0]  # Solo prezzi
-        
-        return x, y
+        return self.windows[idx], self.targets[idx]
+    
+    def __getitems__(self, indices: List[int]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Batch gia' impilato con un solo indexing vettoriale (API batched di
+        torch 2.x). Da usare con _collate_batch come collate_fn
+        """
+        index = torch.as_tensor(indices, dtype=torch.long)
+        return self.windows[index], self.targets[index]
+
+
+def _collate_batch(batch: Tuple[torch.Tensor, torch.Tensor]) -> Tuple[torch.Tensor, torch.Tensor]:
+    """Il batch arriva gia' impilato da TradingDataset.__getitems__"""
+    return batch
 
 class DataPipeline:
     def __init__(self,
@@ -77,7 +133,9 @@ class DataPipeline:
                  sequence_length: int = 60,
                  prediction_horizon: int = 5,
                  train_split: float = 0.8,
-                 features: List[str] = None):
+                 features: List[str] = None,
+                 seed: int = 42,
+                 dtype: torch.dtype = torch.float32):
         """
         Parameters:
             batch_size: Dimensione del batch
@@ -85,16 +143,39 @@ class DataPipeline:
             prediction_horizon: Quanti step avanti predire
             train_split: Frazione dei dati per training
             features: Lista delle feature tecniche da usare
+            seed: Seed per lo shuffle del training loader
+            dtype: Tipo dei tensori dei dataset (float32 o bfloat16)
         """
         self.batch_size = batch_size
         self.sequence_length = sequence_length
         self.prediction_horizon = prediction_horizon
         self.train_split = train_split
         self.features = features or []
+        self.seed = seed
+        self.dtype = dtype
         
-    def prepare_data(self, data: pd.DataFrame) -> Dict[str, DataLoader]:
+    @staticmethod
+    def _num_workers(dataset_size: int) -> int:
+        """
+        Sotto i 10k campioni il caricamento nel processo principale e' piu'
+        veloce: le finestre sono gia' viste in memoria e lo spawn dei worker
+        costa piu' del lavoro che fanno
+        """
+        if dataset_size < 10000:
+            return 0
+        return min(4, (os.cpu_count() or 1) // 2)
+        
+    def prepare_data(self,
+                     data: pd.DataFrame,
+                     loader_kwargs: Optional[Dict] = None) -> Dict[str, DataLoader]:
         """
         Prepara i data loader per training e validation
+        
+        Parameters:
+            data: DataFrame con close, volume e feature
+            loader_kwargs: Override degli argomenti dei DataLoader, applicati
+                a entrambi dopo i default (es. num_workers=0, pin_memory=False
+                nei test, o batch_size)
         """
         # Split train/validation
         train_size = int(len(data) * self.train_split)
@@ -106,32 +187,43 @@ class DataPipeline:
             train_data,
             self.sequence_length,
             self.prediction_horizon,
-            self.features
+            self.features,
+            self.dtype
         )
         
         val_dataset = TradingDataset(
             val_data,
             self.sequence_length,
             self.prediction_horizon,
-            self.features
+            self.features,
+            self.dtype
         )
         
-        # Crea data loaders
-        train_loader = DataLoader(
-            train_dataset,
-            batch_size=self.batch_size,
-            shuffle=True,
-            num_workers=4,
-            pin_memory=True
-        )
+        # Crea data loaders: default prima, override per ultimi, un solo dict
+        # per loader cosi' nessun argomento arriva due volte a DataLoader
+        overrides = dict(loader_kwargs or {})
+        num_workers = overrides.pop('num_workers', self._num_workers(len(train_dataset)))
+        common = {
+            'batch_size': self.batch_size,
+            'collate_fn': _collate_batch,
+            'num_workers': num_workers,
+            'pin_memory': True,
+            'persistent_workers': num_workers > 0,
+            'prefetch_factor': 4 if num_workers > 0 else None
+        }
         
-        val_loader = DataLoader(
-            val_dataset,
-            batch_size=self.batch_size,
-            shuffle=False,
-            num_workers=4,
-            pin_memory=True
-        )
+        train_loader = DataLoader(train_dataset, **{
+            **common,
+            'shuffle': True,
+            'generator': torch.Generator().manual_seed(self.seed),
+            **overrides
+        })
+        
+        val_loader = DataLoader(val_dataset, **{
+            **common,
+            'shuffle': False,
+            **overrides
+        })
         
         return {
             'train': train_loader,
@@ -143,36 +235,52 @@ class DataPipeline:
     
     def add_technical_features(self, data: pd.DataFrame) -> pd.DataFrame:
         """
-        Aggiunge feature tecniche al DataFrame
+        Aggiunge feature tecniche al DataFrame. I calcoli ricorsivi girano in
+        float64; le colonne aggiunte mantengono il dtype float di 'close'
         """
-        df = data.copy()
-        
+        close = data['close'].to_numpy(dtype=np.float64, copy=True)
+        out_dtype = data['close'].dtype
+        if not np.issubdtype(out_dtype, np.floating):
+            out_dtype = np.float64
+
         # RSI
-        delta = df['close'].diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-        rs = gain / loss
-        df['rsi'] = 100 - (100 / (1 + rs))
+        rsi = _rolling_rsi(close, 14)
         
         # MACD
-        exp1 = df['close'].ewm(span=12, adjust=False).mean()
-        exp2 = df['close'].ewm(span=26, adjust=False).mean()
-        df['macd'] = exp1 - exp2
-        df['signal'] = df['macd'].ewm(span=9, adjust=False).mean()
+        exp1 = _ewm(close, 2.0 / (12 + 1))
+        exp2 = _ewm(close, 2.0 / (26 + 1))
+        macd = exp1 - exp2
+        signal = _ewm(macd, 2.0 / (9 + 1))
         
         # Bollinger Bands
-        df['bb_middle'] = df['close'].rolling(window=20).mean()
-        std = df['close'].rolling(window=20).std()
-        df['bb_upper'] = df['bb_middle'] + (std * 2)
-        df['bb_lower'] = df['bb_middle'] - (std * 2)
+        bb_middle = bn.move_mean(close, 20)
+        std = bn.move_std(close, 20, ddof=1)
         
         # Average True Range (ATR)
-        high_low = df['high'] - df['low']
-        high_close = (df['high'] - df['close'].shift()).abs()
-        low_close = (df['low'] - df['close'].shift()).abs()
-        ranges = pd.concat([high_low, high_close, low_close], axis=1)
-        true_range = ranges.max(axis=1)
-        df['atr'] = true_range.rolling(14).mean()
+        high = data['high'].to_numpy(dtype=np.float64)
+        low = data['low'].to_numpy(dtype=np.float64)
+        prev_close = np.empty_like(close)
+        prev_close[1:] = close[:-1]
+        prev_close[:1] = close[:1]
+        true_range = np.maximum.reduce([
+            high - low,
+            np.abs(high - prev_close),
+            np.abs(low - prev_close)
+        ])
+        atr = bn.move_mean(true_range, 14)
+
+        features = {
+            'rsi': rsi,
+            'macd': macd,
+            'signal': signal,
+            'bb_middle': bb_middle,
+            'bb_upper': bb_middle + (std * 2),
+            'bb_lower': bb_middle - (std * 2),
+            'atr': atr
+        }
+        df = data.assign(**{
+            name: values.astype(out_dtype, copy=False) for name, values in features.items()
+        })
         
         # Rimuovi righe con NaN
         df = df.dropna()
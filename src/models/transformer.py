@@ -2,10 +2,14 @@
 Transformer model for 1-minute price predictions with trading-specific optimizations
 """
 from __future__ import annotations
+import math
 import torch
 import torch.nn as nn
-import numpy as np
-from typing import Dict, Union
+import torch.nn.functional as F
+from typing import Dict, List, Union
+
+# Indicizzato dal codice segnale: 0 HOLD, 1 BUY, -1 SELL
+_SIGNALS = ('HOLD', 'BUY', 'SELL')
 
 class TradingTransformer(nn.Module):
    def __init__(self, 
@@ -15,9 +19,17 @@ class TradingTransformer(nn.Module):
                 num_layers: int = 6,
                 dropout: float = 0.1,
                 prediction_horizon: int = 5,  # Predice 5 minuti in avanti
-                confidence_threshold: float = 0.7) -> None:
+                confidence_threshold: float = 0.7,
+                max_len: int = 1000,
+                allow_tf32: bool = False) -> None:
        super().__init__()
        
+       # TF32 per i matmul FP32 residui su GPU Ampere+. I flag sono globali
+       # al processo: vanno abilitati solo su richiesta esplicita
+       if allow_tf32:
+           torch.backends.cuda.matmul.allow_tf32 = True
+           torch.backends.cudnn.allow_tf32 = True
+       
        self.input_size = input_size
        self.confidence_threshold = confidence_threshold
        self.prediction_horizon = prediction_horizon
@@ -30,8 +42,19 @@ class TradingTransformer(nn.Module):
        self.embedding_dropout = nn.Dropout(dropout)
        self.layer_norm = nn.LayerNorm(d_model)
        
-       # Position encoding migliorato per time series
-       self.position_encoding = self.create_position_encoding(d_model)
+       # Position encoding e mask causale come buffer: seguono .to(device)
+       # e vengono solo affettati a seq_len ad ogni forward. Non persistenti,
+       # si ricostruiscono dai parametri e non entrano nello state_dict
+       self.register_buffer(
+           'position_encoding',
+           self.create_position_encoding(d_model, max_len),
+           persistent=False
+       )
+       self.register_buffer(
+           'causal_mask',
+           torch.triu(torch.ones(max_len, max_len, dtype=torch.bool), diagonal=1),
+           persistent=False
+       )
        
        # Transformer layers con attention mask per serie temporali
        encoder_layer = nn.TransformerEncoderLayer(
@@ -47,33 +70,21 @@ class TradingTransformer(nn.Module):
            num_layers=num_layers
        )
        
-       # Output heads
-       self.price_predictor = nn.Sequential(
+       # Output heads: trunk condiviso e un'unica proiezione per prezzo,
+       # confidence e volatilità (un GEMM invece di tre sullo stesso input)
+       self.head_trunk = nn.Sequential(
            nn.Linear(d_model, d_model // 2),
            nn.GELU(),
-           nn.Dropout(dropout),
-           nn.Linear(d_model // 2, prediction_horizon)  # Predice n steps avanti
-       )
-       
-       self.confidence_predictor = nn.Sequential(
-           nn.Linear(d_model, d_model // 2),
-           nn.GELU(),
-           nn.Dropout(dropout),
-           nn.Linear(d_model // 2, prediction_horizon),
-           nn.Sigmoid()  # Confidence score tra 0 e 1
-       )
-       
-       self.volatility_predictor = nn.Sequential(
-           nn.Linear(d_model, d_model // 2),
-           nn.GELU(),
-           nn.Dropout(dropout),
-           nn.Linear(d_model // 2, prediction_horizon),
-           nn.Softplus()  # Volatilità sempre positiva
+           nn.Dropout(dropout)
        )
+       self.head_out = nn.Linear(d_model // 2, 3 * prediction_horizon)
 
    def create_position_encoding(self, d_model: int, max_len: int = 1000) -> torch.Tensor:
-       position = torch.arange(max_len).unsqueeze(1)
-       div_term = torch.exp(torch.arange(0, d_model, 2) * (-np.log(10000.0) / d_model))
+       # Solo operazioni torch: il buffer segue poi .to(device) del modulo
+       position = torch.arange(max_len, dtype=torch.float32).unsqueeze(1)
+       div_term = torch.exp(
+           torch.arange(0, d_model, 2, dtype=torch.float32) * (-math.log(10000.0) / d_model)
+       )
        
        pos_encoding = torch.zeros(max_len, d_model)
        pos_encoding[:, 0::2] = torch.sin(position * div_term)
@@ -81,11 +92,6 @@ class TradingTransformer(nn.Module):
        
        return pos_encoding
    
-   def create_attention_mask(self, seq_len: int) -> torch.Tensor:
-       """Crea una mask causale per l'attention"""
-       mask = torch.triu(torch.ones(seq_len, seq_len), diagonal=1)
-       return mask == 1
-   
    def embed_features(self, x: torch.Tensor) -> torch.Tensor:
        """Embedding separato per diverse feature"""
        price = x[:, :, 0].unsqueeze(-1)
@@ -108,65 +114,98 @@ class TradingTransformer(nn.Module):
        """
        batch_size, seq_len, _ = x.shape
        
-       # Embedding
-       x = self.embed_features(x)
-       
-       # Aggiungi position encoding
-       x = x + self.position_encoding[:seq_len].unsqueeze(0)
-       
-       # Crea attention mask
-       mask = self.create_attention_mask(seq_len)
-       
-       # Transformer encoding
-       x = self.transformer_encoder(x, mask=mask)
+       # Su GPU i matmul girano in bfloat16 sui tensor core; su CPU resta FP32
+       with torch.autocast(device_type=x.device.type,
+                           dtype=torch.bfloat16,
+                           enabled=x.device.type == 'cuda'):
+           # Embedding
+           x = self.embed_features(x)
+           
+           # Aggiungi position encoding
+           x = x + self.position_encoding[:seq_len]
+           
+           # Attention mask causale
+           mask = self.causal_mask[:seq_len, :seq_len]
+           
+           # Transformer encoding: is_causal permette a PyTorch di passare a
+           # scaled_dot_product_attention con kernel fused, senza materializzare la mask
+           x = self.transformer_encoder(x, mask=mask, is_causal=True)
+           
+           # Predictions
+           h = self.head_out(self.head_trunk(x[:, -1]))
        
-       # Predictions
-       price_preds = self.price_predictor(x[:, -1])
-       confidence = self.confidence_predictor(x[:, -1])
-       volatility = self.volatility_predictor(x[:, -1])
+       # Attivazioni e output in FP32 per il codice a valle
+       price_preds, confidence, volatility = h.float().split(self.prediction_horizon, dim=-1)
        
        return {
            'price_predictions': price_preds,
-           'confidence_scores': confidence,
-           'volatility_estimates': volatility
+           'confidence_scores': torch.sigmoid(confidence),  # Confidence score tra 0 e 1
+           'volatility_estimates': F.softplus(volatility)  # Volatilità sempre positiva
        }
    
    def get_trading_signal(self, 
                          predictions: Dict[str, torch.Tensor],
-                         current_price: float) -> Dict[str, Union[str, float, int]]:
+                         current_price: Union[float, torch.Tensor]
+                         ) -> Dict[str, Union[str, float, int]]:
+       """
+       Genera il segnale di trading per una singola previsione (batch di un
+       elemento); per più righe usare get_trading_signals
        """
-       Genera segnali di trading basati su predictions e confidence
+       signals = self.get_trading_signals(predictions, current_price)
+       if len(signals) != 1:
+           raise ValueError(
+               f"get_trading_signal attende un batch di 1 elemento, ricevuti {len(signals)}: "
+               "usare get_trading_signals"
+           )
+       return signals[0]
+   
+   def get_trading_signals(self, 
+                          predictions: Dict[str, torch.Tensor],
+                          current_price: Union[float, torch.Tensor]
+                          ) -> List[Dict[str, Union[str, float, int]]]:
+       """
+       Genera segnali di trading basati su predictions e confidence.
+       Lavora sull'intero batch senza sincronizzazioni intermedie e
+       restituisce sempre una lista di dict, uno per riga
        """
        with torch.no_grad():
-           prices = predictions['price_predictions'].squeeze()
-           confidence = predictions['confidence_scores'].squeeze()
-           volatility = predictions['volatility_estimates'].squeeze()
+           prices = predictions['price_predictions'].reshape(-1, self.prediction_horizon)
+           confidence = predictions['confidence_scores'].reshape(-1, self.prediction_horizon)
+           volatility = predictions['volatility_estimates'].reshape(-1, self.prediction_horizon)
+           # Prezzi correnti in float64 lato CPU per restituirli invariati
+           current_cpu = torch.as_tensor(current_price, dtype=torch.float64).reshape(-1)
+           current = current_cpu.to(device=prices.device, dtype=prices.dtype)
            
-           # Prendi la predizione più vicina con confidence alta
+           # Prima predizione con alta confidence: argmax sulla mask restituisce il primo True
            high_confidence_mask = confidence > self.confidence_threshold
-           if not high_confidence_mask.any():
-               return {'signal': 'HOLD', 'confidence': 0.0, 'target_price': current_price}
-           
-           # Prendi la prima predizione con alta confidence
-           first_confident_idx = high_confidence_mask.nonzero()[0][0]
-           predicted_price = prices[first_confident_idx].item()
-           conf_score = confidence[first_confident_idx].item()
-           vol_estimate = volatility[first_confident_idx].item()
+           has_confident = high_confidence_mask.any(dim=-1)
+           idx = high_confidence_mask.to(torch.int8).argmax(dim=-1, keepdim=True)
+           predicted_price = prices.gather(-1, idx).squeeze(-1)
+           conf_score = confidence.gather(-1, idx).squeeze(-1)
+           vol_estimate = volatility.gather(-1, idx).squeeze(-1)
            
-           # Calcola il segnale
-           price_change = (predicted_price - current_price) / current_price
+           # Segnale senza rami: +1 BUY, 0 HOLD, -1 SELL (indice negativo su _SIGNALS)
+           price_change = (predicted_price - current) / current
+           code = ((price_change > vol_estimate).to(torch.int8)
+                   - (price_change < -vol_estimate).to(torch.int8))
            
-           if price_change > vol_estimate:
-               signal = 'BUY'
-           elif price_change < -vol_estimate:
-               signal = 'SELL'
-           else:
-               signal = 'HOLD'
-               
-           return {
-               'signal': signal,
-               'confidence': conf_score,
-               'target_price': predicted_price,
-               'volatility': vol_estimate,
-               'prediction_minutes_ahead': first_confident_idx + 1
-           }
\ No newline at end of file
+           # Un solo trasferimento verso la CPU
+           out = torch.stack([
+               has_confident.to(prices.dtype), code.to(prices.dtype), conf_score,
+               predicted_price, vol_estimate, idx.squeeze(-1).to(prices.dtype)
+           ]).cpu().tolist()
+           current_prices = current_cpu.expand(len(out[0])).tolist()
+       
+       signals = []
+       for ok, c, conf, target, vol, i, price in zip(*out, current_prices):
+           if not ok:
+               signals.append({'signal': 'HOLD', 'confidence': 0.0, 'target_price': price})
+               continue
+           signals.append({
+               'signal': _SIGNALS[int(c)],
+               'confidence': conf,
+               'target_price': target,
+               'volatility': vol,
+               'prediction_minutes_ahead': int(i) + 1
+           })
+       return signals
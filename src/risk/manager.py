@@ -1,16 +1,75 @@
 """
 Risk management module
 """
-from typing import Dict, Tuple, Optional, List
+from types import MappingProxyType
+from typing import Dict, Tuple, Optional, List, Mapping
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from src.utils._njit import njit
+
+_NO_LIMITS = MappingProxyType({})
+
+
+@njit('float64(float64[:])', cache=True, fastmath=True)
+def _max_drawdown_njit(capitals):
+    """Maximum drawdown percentuale in un solo passaggio"""
+    if capitals.size == 0:
+        return 0.0
+    peak = capitals[0]
+    max_dd = 0.0
+    for capital in capitals:
+        if capital > peak:
+            peak = capital
+        dd = (peak - capital) / peak
+        if dd > max_dd:
+            max_dd = dd
+    return max_dd * 100
+
+
+@njit('float64(float64[:])', cache=True, fastmath=True)
+def _sharpe_ratio_njit(capitals):
+    """Sharpe annualizzato (252 periodi) dei rendimenti tra capitali consecutivi"""
+    n = capitals.size - 1
+    if n < 1:
+        return 0.0
+    total = 0.0
+    for i in range(n):
+        total += (capitals[i + 1] - capitals[i]) / capitals[i]
+    mean = total / n
+    var = 0.0
+    for i in range(n):
+        diff = (capitals[i + 1] - capitals[i]) / capitals[i] - mean
+        var += diff * diff
+    std = np.sqrt(var / n)
+    if std == 0:
+        return 0.0
+    return mean / std * np.sqrt(252.0)
 
 class RiskManager:
+    # Limiti per broker, costanti e in sola lettura
+    BROKER_LIMITS = MappingProxyType({
+        'binance': MappingProxyType({
+            'max_leverage': 20,
+            'min_notional': 10,  # USDT
+            'max_orders': 100
+        }),
+        'interactive_brokers': MappingProxyType({
+            'max_leverage': 4,
+            'min_notional': 100,  # USD
+            'pattern_day_trading': True
+        })
+    })
+    # Pesi news, social, technical per lo score di sentiment
+    _SENTIMENT_WEIGHTS = np.array([0.3, 0.3, 0.4])
+    _SENTIMENT_WEIGHTS.flags.writeable = False
+
     def __init__(self, settings: dict):
         # Configurazione generale
         self.risk_per_trade = settings.get('risk_per_trade', 0.02)  # 2% per trade
         self.max_portfolio_risk = settings.get('max_portfolio_risk', 0.06)  # 6% totale
         self.max_correlation = settings.get('max_correlation', 0.7)  # 70% correlazione massima
         self.stop_loss_atr_multiplier = settings.get('stop_loss_atr_multiplier', 2)
+        self.regime_window = settings.get('regime_window', 20)  # Barre per la volatilità mobile
     
     def calculate_position_size(self, 
                               account_balance: float,
@@ -29,21 +88,9 @@ class RiskManager:
             'risk_percent': self.risk_per_trade * 100
         }
 
-    def get_broker_risk_limits(self, broker_name: str) -> Dict:
-        """Ottiene i limiti di rischio specifici del broker"""
-        broker_limits = {
-            'binance': {
-                'max_leverage': 20,
-                'min_notional': 10,  # USDT
-                'max_orders': 100
-            },
-            'interactive_brokers': {
-                'max_leverage': 4,
-                'min_notional': 100,  # USD
-                'pattern_day_trading': True
-            }
-        }
-        return broker_limits.get(broker_name, {})
+    def get_broker_risk_limits(self, broker_name: str) -> Mapping:
+        """Ottiene i limiti di rischio specifici del broker (mapping in sola lettura)"""
+        return self.BROKER_LIMITS.get(broker_name, _NO_LIMITS)
 
     def calculate_safe_leverage(self, 
                               account_balance: float,
@@ -63,11 +110,17 @@ class RiskManager:
                             price_data: np.ndarray,
                             volume_data: np.ndarray) -> Dict:
         """Identifica il regime di mercato per adattare il risk management"""
-        volatility = np.std(price_data)
-        avg_volume = np.mean(volume_data)
+        # Deviazione standard mobile su finestre di regime_window barre: la volatilità
+        # corrente è alta se supera media + 1 std della sua storia recente
+        window = min(self.regime_window, len(price_data))
+        rolling_std = sliding_window_view(price_data, window).std(axis=-1)
+        volatility = rolling_std[-1]
+        
+        # Volume corrente contro la media della finestra, non dell'intera storia
+        avg_volume = np.mean(volume_data[-window:])
         recent_volume = volume_data[-1]
         
-        is_high_volatility = volatility > np.mean(volatility) + np.std(volatility)
+        is_high_volatility = volatility > rolling_std.mean() + rolling_std.std()
         is_high_volume = recent_volume > avg_volume * 1.5
         
         if is_high_volatility and is_high_volume:
@@ -98,16 +151,20 @@ class RiskManager:
             'low_risk': []
         }
         
-        total_exposure = sum(pos['value'] for pos in positions.values())
+        if not positions:
+            return risk_map
+        
+        # Valori e simboli come array paralleli, classificati in un solo passaggio
+        symbols = np.array(list(positions), dtype=object)
+        values = np.fromiter((pos['value'] for pos in positions.values()),
+                             dtype=np.float64, count=len(positions))
+        risk_ratios = values / values.sum()
         
-        for symbol, pos in positions.items():
-            risk_ratio = pos['value'] / total_exposure
-            if risk_ratio > 0.2:  # Più del 20% del portafoglio
-                risk_map['high_risk'].append(symbol)
-            elif risk_ratio > 0.1:  # Tra 10% e 20%
-                risk_map['medium_risk'].append(symbol)
-            else:
-                risk_map['low_risk'].append(symbol)
+        # 0: fino al 10%, 1: tra 10% e 20%, 2: più del 20% del portafoglio
+        buckets = np.digitize(risk_ratios, [0.1, 0.2], right=True)
+        risk_map['low_risk'] = symbols[buckets == 0].tolist()
+        risk_map['medium_risk'] = symbols[buckets == 1].tolist()
+        risk_map['high_risk'] = symbols[buckets == 2].tolist()
         
         return risk_map
 
@@ -115,24 +172,17 @@ class RiskManager:
                                base_risk: float,
                                sentiment_data: Dict) -> Dict:
         """Adatta il rischio base ai dati del sentiment"""
-        weights = {
-            'news': 0.3,
-            'social': 0.3,
-            'technical': 0.4
-        }
+        scores = np.array([
+            sentiment_data['news_sentiment']['score'],
+            sentiment_data['social_sentiment']['score'],
+            sentiment_data['technical_sentiment']['score']
+        ])
+        weighted_score = float(self._SENTIMENT_WEIGHTS @ scores)
         
-        weighted_score = (
-            sentiment_data['news_sentiment']['score'] * weights['news'] +
-            sentiment_data['social_sentiment']['score'] * weights['social'] +
-            sentiment_data['technical_sentiment']['score'] * weights['technical']
-        )
-        
-        if weighted_score > 0.8:
-            risk_multiplier = 1.2
-        elif weighted_score < 0.2:
-            risk_multiplier = 0.6
-        else:
-            risk_multiplier = 1.0
+        # Sentiment > 0.8 aumenta il rischio, < 0.2 lo riduce
+        risk_multiplier = float(np.select(
+            [weighted_score > 0.8, weighted_score < 0.2], [1.2, 0.6], default=1.0
+        ))
         
         adjusted_risk = base_risk * risk_multiplier
         
@@ -206,93 +256,81 @@ class RiskManager:
         }
         
         initial_capital = strategy_params.get('initial_capital', 10000)
-        capital = initial_capital
         
-        for date, data in historical_data.items():
-            # Calcola risk score per il periodo
-            risk_score = self.calculate_risk_score(
-                data['market'],
-                data['sentiment'],
-                data['portfolio']
-            )
-            
-            # Simula trade con risk management
-            position_size = self.calculate_position_size(
-                capital,
-                data['price'],
-                data['price'] * 0.95
-            )
-            
-            # Adatta position size al risk score
-            adjusted_size = position_size['position_size'] * (risk_score['score'] / 100)
-            
-            # Simula risultato del trade
-            pnl = data['next_price'] - data['price']
-            trade_result = adjusted_size * pnl
-            
-            # Aggiorna capitale
-            capital += trade_result
-            
+        # Risk score per periodo: non dipende dal capitale, si calcola a parte
+        dates = list(historical_data)
+        rows = list(historical_data.values())
+        risk_scores = [
+            self.calculate_risk_score(data['market'], data['sentiment'], data['portfolio'])
+            for data in rows
+        ]
+        n = len(rows)
+        prices = np.fromiter((data['price'] for data in rows), dtype=np.float64, count=n)
+        next_prices = np.fromiter((data['next_price'] for data in rows), dtype=np.float64, count=n)
+        score_factor = np.fromiter((rs['score'] for rs in risk_scores), dtype=np.float64, count=n) / 100
+        
+        # Size = capitale * rischio / |prezzo - stop| con stop al -5%, quindi
+        # ogni trade moltiplica il capitale per (1 + g): traiettoria con un cumprod
+        price_risk = np.abs(prices - prices * 0.95)
+        growth = self.risk_per_trade * score_factor * (next_prices - prices) / price_risk
+        capitals = initial_capital * np.cumprod(1 + growth)
+        capital_prev = np.concatenate(([initial_capital], capitals[:-1]))
+        
+        original_sizes = capital_prev * self.risk_per_trade / price_risk
+        adjusted_sizes = original_sizes * score_factor
+        trade_results = adjusted_sizes * (next_prices - prices)
+        capital = capitals[-1].item() if n else initial_capital
+        
+        for date, risk_score, original, adjusted, pnl, cap in zip(
+                dates, risk_scores, original_sizes.tolist(), adjusted_sizes.tolist(),
+                trade_results.tolist(), capitals.tolist()):
             results['trades'].append({
                 'date': date,
                 'risk_score': risk_score,
-                'position_size': adjusted_size,
-                'pnl': trade_result,
-                'capital': capital
+                'position_size': adjusted,
+                'pnl': pnl,
+                'capital': cap
             })
             
             results['risk_adjustments'].append({
                 'date': date,
-                'original_size': position_size['position_size'],
-                'adjusted_size': adjusted_size,
+                'original_size': original,
+                'adjusted_size': adjusted,
                 'risk_score': risk_score
             })
         
+        # Drawdown calcolato una volta e riusato dal rendimento aggiustato
+        max_dd = self._calculate_max_drawdown(results['trades'])
         results['metrics'] = {
             'final_capital': capital,
             'total_return': (capital - initial_capital) / initial_capital * 100,
-            'max_drawdown': self._calculate_max_drawdown(results['trades']),
+            'max_drawdown': max_dd,
             'sharpe_ratio': self._calculate_sharpe_ratio(results['trades']),
-            'risk_adjusted_return': self._calculate_risk_adjusted_return(results['trades'])
+            'risk_adjusted_return': self._calculate_risk_adjusted_return(results['trades'], max_dd)
         }
         
         return results
 
+    @staticmethod
+    def _capitals(trades: List[Dict]) -> np.ndarray:
+        """Serie del capitale come array contiguo float64"""
+        return np.fromiter((t['capital'] for t in trades), dtype=np.float64, count=len(trades))
+
     def _calculate_max_drawdown(self, trades: List[Dict]) -> float:
         """Calcola il maximum drawdown dalla serie di trades"""
-        capitals = [t['capital'] for t in trades]
-        peak = capitals[0]
-        max_dd = 0
-        
-        for capital in capitals:
-            if capital > peak:
-                peak = capital
-            dd = (peak - capital) / peak
-            if dd > max_dd:
-                max_dd = dd
-        
-        return max_dd * 100
+        return _max_drawdown_njit(self._capitals(trades))
 
     def _calculate_sharpe_ratio(self, trades: List[Dict]) -> float:
         """Calcola lo Sharpe Ratio dei trades"""
-        returns = [(t['capital'] - prev['capital']) / prev['capital'] 
-                  for t, prev in zip(trades[1:], trades[:-1])]
-        
-        if not returns:
-            return 0
-        
-        avg_return = np.mean(returns)
-        std_return = np.std(returns)
-        
-        if std_return == 0:
-            return 0
-            
-        return (avg_return / std_return) * np.sqrt(252)
+        return _sharpe_ratio_njit(self._capitals(trades))
 
-    def _calculate_risk_adjusted_return(self, trades: List[Dict]) -> float:
+    def _calculate_risk_adjusted_return(self,
+                                        trades: List[Dict],
+                                        max_dd: Optional[float] = None) -> float:
         """Calcola il rendimento aggiustato per il rischio"""
         total_return = (trades[-1]['capital'] - trades[0]['capital']) / trades[0]['capital']
-        max_dd = self._calculate_max_drawdown(trades)
+        if max_dd is None:
+            max_dd = self._calculate_max_drawdown(trades)
         
         if max_dd == 0:
             return 0
@@ -301,18 +339,27 @@ class RiskManager:
 
     def calculate_correlation_risk(self, asset_returns: Dict[str, np.ndarray]) -> Dict:
         """Calcola il rischio di correlazione tra asset"""
-        correlations = {}
-        high_corr_pairs = []
-        
         assets = list(asset_returns.keys())
-        for i in range(len(assets)):
-            for j in range(i+1, len(assets)):
-                asset1, asset2 = assets[i], assets[j]
-                corr = np.corrcoef(asset_returns[asset1], asset_returns[asset2])[0,1]
-                correlations[f"{asset1}-{asset2}"] = corr
-                
-                if abs(corr) > self.max_correlation:
-                    high_corr_pairs.append((asset1, asset2, corr))
+        if len(assets) < 2:
+            return {
+                'correlations': {},
+                'high_correlation_pairs': [],
+                'max_correlation': self.max_correlation
+            }
+        
+        # Una sola matrice di correlazione (N, N) e triangolo superiore
+        corr_matrix = np.corrcoef(np.stack([asset_returns[a] for a in assets]))
+        rows, cols = np.triu_indices(len(assets), k=1)
+        corr_values = corr_matrix[rows, cols]
+        
+        correlations = {
+            f"{assets[i]}-{assets[j]}": corr
+            for i, j, corr in zip(rows.tolist(), cols.tolist(), corr_values.tolist())
+        }
+        high = np.flatnonzero(np.abs(corr_values) > self.max_correlation)
+        high_corr_pairs = [
+            (assets[rows[k]], assets[cols[k]], corr_values[k].item()) for k in high
+        ]
         
         return {
             'correlations': correlations,
@@ -2,7 +2,10 @@
 Servizio di notifiche Telegram per il Trading Assistant
 """
 import os
+import time
+import secrets
 import asyncio
+from collections import deque
 from telegram import (
     Bot, 
     Update, 
@@ -15,19 +18,30 @@ from telegram.ext import (
     CallbackQueryHandler,
     ContextTypes
 )
-from datetime import datetime
-from typing import Dict
+from telegram.request import HTTPXRequest
+from typing import Dict, List
 
 class TelegramService:
-    def __init__(self):
+    def __init__(self, order_ttl: float = 3600.0):
         self.bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
         self.chat_id = os.getenv('TELEGRAM_CHAT_ID')
         self.pending_orders = {}
+        # Scadenze in ordine di inserimento: gli ordini ignorati non restano in memoria
+        self.order_ttl = order_ttl
+        self._order_expiry = deque()
+        # ID ordine = prefisso casuale del processo + contatore: univoci anche
+        # per segnali nello stesso secondo e dopo un riavvio, quando i bottoni
+        # dei messaggi precedenti non devono approvare un ordine nuovo
+        self._order_prefix = secrets.token_hex(4)
+        self._order_seq = 0
+        self._order_lock = asyncio.Lock()
         self.setup_bot()
 
     def setup_bot(self):
         """Inizializza il bot e i suoi handler"""
-        self.app = Application.builder().token(self.bot_token).build()
+        # Pool di connessioni persistente condiviso da tutti gli invii
+        request = HTTPXRequest(connection_pool_size=32, pool_timeout=5.0)
+        self.app = Application.builder().token(self.bot_token).request(request).build()
         self.app.add_handler(CommandHandler("start", self._start_command))
         self.app.add_handler(CallbackQueryHandler(self._button_callback))
 
@@ -45,8 +59,13 @@ class TelegramService:
         """
         Invia segnale di trading e richiede autorizzazione
         """
-        order_id = datetime.now().strftime('%Y%m%d%H%M%S')
-        self.pending_orders[order_id] = signal_data
+        async with self._order_lock:
+            now = time.monotonic()
+            self._expire_orders(now)
+            self._order_seq += 1
+            order_id = f'{self._order_prefix}{self._order_seq:016x}'
+            self.pending_orders[order_id] = signal_data
+            self._order_expiry.append((now + self.order_ttl, order_id))
         
         message = self._format_signal_message(signal_data, order_id)
         keyboard = self._create_approval_keyboard(order_id)
@@ -63,6 +82,26 @@ class TelegramService:
             print(f"Error sending signal: {e}")
             return False
 
+    async def send_trade_signals(self, signals: List[Dict]) -> List[bool]:
+        """
+        Invia piu' segnali in parallelo sullo stesso pool di connessioni.
+        Un segnale che fallisce vale False senza nascondere l'esito degli altri
+        """
+        results = await asyncio.gather(
+            *(self.send_trade_signal(s) for s in signals),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                print(f"Error sending signal: {result}")
+        return [result is True for result in results]
+
+    def _expire_orders(self, now: float) -> None:
+        """Rimuove gli ordini scaduti; la deque e' ordinata per scadenza"""
+        expiry = self._order_expiry
+        while expiry and expiry[0][0] <= now:
+            self.pending_orders.pop(expiry.popleft()[1], None)
+
     def _format_signal_message(self, signal: Dict, order_id: str) -> str:
         """Formatta il messaggio del segnale"""
         return (
@@ -106,11 +145,11 @@ class TelegramService:
         query = update.callback_query
         action, order_id = query.data.split('_')
         
-        if order_id not in self.pending_orders:
+        self._expire_orders(time.monotonic())
+        signal_data = self.pending_orders.pop(order_id, None)
+        if signal_data is None:
             await query.answer("Order expired or already processed")
             return
-            
-        signal_data = self.pending_orders[order_id]
         
         if action == "approve":
             await query.edit_message_text(
@@ -122,6 +161,4 @@ class TelegramService:
             await query.edit_message_text(
                 f"❌ Order Rejected\n\n"
                 f"Signal for {signal_data['symbol']} has been cancelled."
-            )
-        
-        del self.pending_orders[order_id]
\ No newline at end of file
+            )
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""
+Decoratore njit con fallback quando numba non e' installato
+"""
+try:
+    from numba import njit, prange
+except ImportError:  # pragma: no cover - numba opzionale
+    prange = range
+
+    def njit(*args, **kwargs):
+        """Restituisce la funzione Python originale, senza compilazione"""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+
+        def decorator(func):
+            return func
+        return decorator
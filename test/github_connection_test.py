@@ -1,86 +1,107 @@
-import requests
+import asyncio
+import base64
+import httpx
 import os
 from dotenv import load_dotenv
 
+# .env letto una sola volta all'import, non ad ogni test
+load_dotenv()
+
+def _github_client(headers: dict) -> httpx.AsyncClient:
+    """Client HTTP/2: le richieste concorrenti sono multiplexate su una connessione"""
+    return httpx.AsyncClient(
+        http2=True,
+        headers=headers,
+        timeout=10.0,
+        limits=httpx.Limits(max_connections=4, max_keepalive_connections=4)
+    )
+
+async def _check_repository(repo_url: str, headers: dict) -> bool:
+    async with _github_client(headers) as client:
+        response = await client.get(repo_url)
+
+    if response.status_code == 200:
+        print("Connessione al repository GitHub riuscita!")
+        repo_data = response.json()
+        print("\nInformazioni repository:")
+        print(f"Nome: {repo_data['name']}")
+        print(f"Branch default: {repo_data['default_branch']}")
+        return True
+    else:
+        print("Errore nella connessione al repository")
+        print(f"Status code: {response.status_code}")
+        print(f"Errore: {response.json().get('message')}")
+        return False
+
 def test_github_connection():
-    load_dotenv()
-    
     GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
     if not GITHUB_TOKEN:
         print("GITHUB_TOKEN non trovato nel file .env")
         return False
-    
+
     repo_url = "https://api.github.com/repos/Rns-lab/trading-assistant-mcp"
     headers = {
         "Authorization": f"Bearer {GITHUB_TOKEN}",
         "Accept": "application/vnd.github.v3+json"
     }
-    
+
     try:
-        response = requests.get(repo_url, headers=headers)
-        
-        if response.status_code == 200:
-            print("Connessione al repository GitHub riuscita!")
-            repo_data = response.json()
-            print("\nInformazioni repository:")
-            print(f"Nome: {repo_data['name']}")
-            print(f"Branch default: {repo_data['default_branch']}")
-            return True
-        else:
-            print("Errore nella connessione al repository")
-            print(f"Status code: {response.status_code}")
-            print(f"Errore: {response.json().get('message')}")
-            return False
-            
+        return asyncio.run(_check_repository(repo_url, headers))
+
     except Exception as e:
         print("Errore durante il test di connessione:")
         print(str(e))
         return False
 
+def _upload_request(client: httpx.AsyncClient, repo_url: str, path: str,
+                    data: bytes, message: str):
+    """Richiesta di upload: base64 calcolato una sola volta direttamente dai bytes"""
+    encoded = base64.b64encode(data).decode('ascii')
+    return client.put(f"{repo_url}/contents/{path}",
+                      json={"message": message, "content": encoded})
+
+async def _read_and_write(repo_url: str, headers: dict) -> bool:
+    contents_url = f"{repo_url}/contents"
+
+    test_file_path = "test_file.txt"
+    content = b"Test file content"
+
+    # Stessa connessione per READ e WRITE, ma in sequenza: il PUT crea un
+    # commit reale e parte solo dopo una lettura riuscita
+    async with _github_client(headers) as client:
+        read_response = await client.get(contents_url)
+        if read_response.status_code != 200:
+            print("Errore nella lettura del repository")
+            return False
+        print("✓ Lettura repository riuscita")
+
+        write_response = await _upload_request(
+            client, repo_url, test_file_path, content, "Test commit"
+        )
+
+    if write_response.status_code not in [200, 201]:
+        print("Errore nella creazione del file")
+        return False
+    print("✓ Creazione file riuscita")
+
+    return True
+
 def test_github_operations():
-    load_dotenv()
-    
     GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
     if not GITHUB_TOKEN:
         print("GITHUB_TOKEN non trovato nel file .env")
         return False
-    
+
     # Add this line to define repo_url
     repo_url = "https://api.github.com/repos/Rns-lab/trading-assistant-mcp"
     headers = {
         "Authorization": f"Bearer {GITHUB_TOKEN}",
         "Accept": "application/vnd.github.v3+json"
     }
-    
-    # Test READ - Get repository contents
-    contents_url = f"{repo_url}/contents"
+
     try:
-        response = requests.get(contents_url, headers=headers)
-        if response.status_code != 200:
-            print("Errore nella lettura del repository")
-            return False
-        print("✓ Lettura repository riuscita")
-        
-        # Test WRITE - Create a new file
-        test_file_path = "test_file.txt"
-        create_file_url = f"{repo_url}/contents/{test_file_path}"
-        content = "Test file content"
-        import base64
-        content_bytes = base64.b64encode(content.encode()).decode()
-        
-        data = {
-            "message": "Test commit",
-            "content": content_bytes
-        }
-        
-        response = requests.put(create_file_url, json=data, headers=headers)
-        if response.status_code not in [200, 201]:
-            print("Errore nella creazione del file")
-            return False
-        print("✓ Creazione file riuscita")
-        
-        return True
-        
+        return asyncio.run(_read_and_write(repo_url, headers))
+
     except Exception as e:
         print(f"Errore durante il test delle operazioni: {str(e)}")
         return False
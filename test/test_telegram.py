@@ -1,28 +1,29 @@
 import os
-import requests
+import asyncio
+import httpx
 from dotenv import load_dotenv
 from datetime import datetime
 
-def test_telegram_connection():
-    """Test della connessione al bot Telegram dopo la correzione del formato"""
-    
-    # Ricarica le variabili d'ambiente
-    load_dotenv()
-    token = os.getenv("TELEGRAM_BOT_TOKEN")
-    chat_id = os.getenv("TELEGRAM_CHAT_ID")
-    
-    if not token or not chat_id:
-        print("❌ Variabili d'ambiente non trovate")
-        print(f"Token presente: {'✓' if token else '✗'}")
-        print(f"Chat ID presente: {'✓' if chat_id else '✗'}")
-        return False
-    
-    base_url = f'https://api.telegram.org/bot{token}'
+# .env letto una sola volta all'import, non ad ogni test
+load_dotenv()
+
+async def _probe_bot(base_url: str, chat_id: str) -> bool:
+    """
+    getMe e poi sendMessage sulla stessa connessione HTTP/2: il messaggio
+    arriva davvero in chat, quindi parte solo se il token e' valido
+    """
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    test_message = f"""🔄 Test Connessione Bot
+        
+⏰ Timestamp: {current_time}
+🆔 Chat ID: {chat_id}
+        
+Se ricevi questo messaggio, la connessione è attiva."""
     
-    try:
+    async with httpx.AsyncClient(http2=True, timeout=5.0) as client:
         # 1. Test connessione base
         print("\n1. Test connessione base al bot...")
-        me_response = requests.get(f'{base_url}/getMe')
+        me_response = await client.get(f'{base_url}/getMe')
         print(f"Status: {me_response.status_code}")
         if me_response.status_code == 200:
             bot_info = me_response.json()
@@ -33,15 +34,7 @@ def test_telegram_connection():
         
         # 2. Test invio messaggio
         print("\n2. Test invio messaggio...")
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        test_message = f"""🔄 Test Connessione Bot
-        
-⏰ Timestamp: {current_time}
-🆔 Chat ID: {chat_id}
-        
-Se ricevi questo messaggio, la connessione è attiva."""
-        
-        msg_response = requests.post(
+        msg_response = await client.post(
             f'{base_url}/sendMessage',
             json={
                 'chat_id': chat_id,
@@ -49,14 +42,31 @@ Se ricevi questo messaggio, la connessione è attiva."""
                 'parse_mode': 'HTML'
             }
         )
-        
-        print(f"Status invio: {msg_response.status_code}")
-        if msg_response.status_code == 200:
-            print("✓ Messaggio inviato con successo")
-            return True
-        else:
-            print(f"✗ Errore invio: {msg_response.text}")
-            return False
+    
+    print(f"Status invio: {msg_response.status_code}")
+    if msg_response.status_code == 200:
+        print("✓ Messaggio inviato con successo")
+        return True
+    else:
+        print(f"✗ Errore invio: {msg_response.text}")
+        return False
+
+def test_telegram_connection():
+    """Test della connessione al bot Telegram dopo la correzione del formato"""
+    
+    token = os.getenv("TELEGRAM_BOT_TOKEN")
+    chat_id = os.getenv("TELEGRAM_CHAT_ID")
+    
+    if not token or not chat_id:
+        print("❌ Variabili d'ambiente non trovate")
+        print(f"Token presente: {'✓' if token else '✗'}")
+        print(f"Chat ID presente: {'✓' if chat_id else '✗'}")
+        return False
+    
+    base_url = f'https://api.telegram.org/bot{token}'
+    
+    try:
+        return asyncio.run(_probe_bot(base_url, chat_id))
             
     except Exception as e:
         print(f"✗ Errore durante il test: {str(e)}")
@@ -0,0 +1,46 @@
+"""
+Test suite for the Binance broker price cache
+"""
+import asyncio
+import unittest
+from unittest import mock
+from src.core.broker import BinanceBroker
+
+
+class TestBinanceBrokerCache(unittest.TestCase):
+    def setUp(self):
+        self.client = mock.AsyncMock()
+        self.client.get_symbol_ticker.return_value = {'symbol': 'BTCUSDT', 'price': '100.0'}
+        self.broker = BinanceBroker(self.client, price_ttl=1.0)
+
+    def test_get_price_ttl_hit(self):
+        """Entro il TTL il prezzo arriva dalla cache senza nuove richieste"""
+        with mock.patch('src.core.broker.time') as clock:
+            clock.monotonic.side_effect = [10.0, 10.5]
+            self.assertEqual(asyncio.run(self.broker.get_price('BTCUSDT')), 100.0)
+            self.client.get_symbol_ticker.return_value = {'symbol': 'BTCUSDT', 'price': '200.0'}
+            self.assertEqual(asyncio.run(self.broker.get_price('BTCUSDT')), 100.0)
+        self.client.get_symbol_ticker.assert_awaited_once()
+
+    def test_get_price_ttl_expiry(self):
+        """Scaduto il TTL il prezzo viene richiesto di nuovo"""
+        with mock.patch('src.core.broker.time') as clock:
+            clock.monotonic.side_effect = [10.0, 11.5, 11.5]
+            self.assertEqual(asyncio.run(self.broker.get_price('BTCUSDT')), 100.0)
+            self.client.get_symbol_ticker.return_value = {'symbol': 'BTCUSDT', 'price': '200.0'}
+            self.assertEqual(asyncio.run(self.broker.get_price('BTCUSDT')), 200.0)
+        self.assertEqual(self.client.get_symbol_ticker.await_count, 2)
+
+    def test_get_prices_missing_symbol(self):
+        """Un simbolo assente dal batch non ricade sul vecchio prezzo in cache"""
+        asyncio.run(self.broker.get_price('BTCUSDT'))
+        self.client.get_all_tickers.return_value = [{'symbol': 'ETHUSDT', 'price': '50.0'}]
+
+        prices = asyncio.run(self.broker.get_prices(['BTCUSDT', 'ETHUSDT']))
+
+        self.assertEqual(prices, {'ETHUSDT': 50.0})
+        self.assertEqual(self.broker._price_cache['ETHUSDT'][0], 50.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,74 +1,186 @@
 """
 Test suite for data pipeline
 """
-import unittest
+import os
+from functools import cache
 import pandas as pd
 import numpy as np
+import pytest
+import torch
+from src.utils._njit import njit
 from src.models.data_pipeline import DataPipeline, TradingDataset
+from src.analysis.indicators import _rolling_rsi
 
-class TestDataPipeline(unittest.TestCase):
-    def setUp(self):
-        """Crea dati di test"""
-        # Crea dati finti
-        np.random.seed(42)
-        dates = pd.date_range(start='2024-01-01', periods=1000, freq='1min')
-        
-        self.test_data = pd.DataFrame({
-            'open': np.random.randn(1000).cumsum() + 100,
-            'high': np.random.randn(1000).cumsum() + 102,
-            'low': np.random.randn(1000).cumsum() + 98,
-            'close': np.random.randn(1000).cumsum() + 100,
-            'volume': np.random.randint(1000, 10000, 1000)
-        }, index=dates)
-        
-        self.pipeline = DataPipeline(
-            batch_size=32,
-            sequence_length=60,
-            prediction_horizon=5
-        )
+# Righe del dataset sintetico: le minime (circa) perche' anche il validation
+# set, dopo warm-up degli indicatori e finestre 60+5, abbia dei campioni
+PERIODS = int(os.environ.get('TA_TEST_PERIODS', '350'))
+
+# Colonne che add_technical_features deve aggiungere
+_EXPECTED_FEATURES = frozenset(('rsi', 'macd', 'signal', 'bb_middle',
+                                'bb_upper', 'bb_lower', 'atr'))
+
+# Seed unico per dati sintetici e shuffle: nessuno stato RNG globale
+SEED = 42
+
+# Dati gia' in RAM: niente worker ne' pinned memory per i loader dei test
+_TEST_LOADER_KWARGS = {'num_workers': 0, 'pin_memory': False}
+
+@cache
+def _make_test_data(periods: int = PERIODS) -> pd.DataFrame:
+    """Crea dati finti OHLCV una volta per dimensione; i test li leggono soltanto,
+    chi dovesse modificarli usi .copy(deep=False)"""
+    rng = np.random.default_rng(SEED)
+    
+    # Un solo buffer (periods, 4) per open/high/low/close, colonne come viste
+    base = rng.standard_normal((periods, 4)).cumsum(axis=0)
+    base += np.array([100, 102, 98, 100])
+    # float32 come i tensori a valle: metà dei byte per indicatori e scaling
+    base = base.astype(np.float32, copy=False)
+    
+    return pd.DataFrame({
+        'open': base[:, 0],
+        'high': base[:, 1],
+        'low': base[:, 2],
+        'close': base[:, 3],
+        'volume': rng.integers(1000, 10000, periods, dtype=np.int32)
+    })
+
+@njit(cache=True)
+def _has_nan(values):
+    """Scansione con uscita al primo NaN, compilata una volta per dtype"""
+    for v in values.ravel():
+        if v != v:
+            return True
+    return False
+
+def _frame_has_nan(df: pd.DataFrame) -> bool:
+    """Controlla colonna per colonna i buffer float contigui, senza copia mista"""
+    return any(_has_nan(df[name].to_numpy(copy=False))
+               for name in df.select_dtypes(include=np.floating).columns)
+
+@pytest.fixture(scope='module')
+def pipeline() -> DataPipeline:
+    """Pipeline condivisa dal modulo: prepare_data non modifica lo stato dell'istanza"""
+    return DataPipeline(batch_size=32, sequence_length=60, prediction_horizon=5, seed=SEED)
+
+@pytest.fixture(scope='module')
+def synthetic_data() -> pd.DataFrame:
+    """Dati finti deterministici, gia' memoizzati da _make_test_data"""
+    return _make_test_data(PERIODS)
+
+@pytest.fixture(scope='module')
+def featured(pipeline, synthetic_data) -> pd.DataFrame:
+    """Feature tecniche calcolate una volta per modulo; i test leggono soltanto"""
+    return pipeline.add_technical_features(synthetic_data)
+
+@pytest.fixture(scope='module')
+def loaders(pipeline, featured) -> dict:
+    """Scaler fittati e loader condivisi da tutti i test del modulo"""
+    return pipeline.prepare_data(featured, loader_kwargs=_TEST_LOADER_KWARGS)
+
+@pytest.fixture(scope='module')
+def first_batch(loaders):
+    """Un solo iteratore e un solo collate per tutti i test sul batch"""
+    return next(iter(loaders['train']))
+
+def test_technical_features(featured):
+    """Test aggiunta feature tecniche"""
+    # Verifica che tutte le feature attese siano presenti
+    missing = _EXPECTED_FEATURES.difference(featured.columns)
+    assert not missing, f"missing features: {missing}"
+    
+    # Feature nello stesso dtype float32 dei prezzi: la matrice che
+    # TradingDataset estrae con prezzo e feature resta float32, senza upcast
+    for name in _EXPECTED_FEATURES:
+        assert featured[name].dtype == featured['close'].dtype == np.float32
+    assert featured[['close', *sorted(_EXPECTED_FEATURES)]].to_numpy().dtype == np.float32
+    assert featured.select_dtypes(exclude=np.number).empty
     
-    def test_technical_features(self):
-        """Test aggiunta feature tecniche"""
-        df = self.pipeline.add_technical_features(self.test_data)
-        
-        # Verifica che tutte le feature attese siano presenti
-        expected_features = ['rsi', 'macd', 'signal', 'bb_middle', 
-                           'bb_upper', 'bb_lower', 'atr']
-        for feature in expected_features:
-            self.assertIn(feature, df.columns)
-        
-        # Verifica che non ci siano NaN
-        self.assertFalse(df.isnull().any().any())
+    # Verifica che non ci siano NaN
+    assert not _frame_has_nan(featured)
+
+def test_data_preparation(loaders, first_batch):
+    """Test preparazione dei data loader"""
+    # Verifica che ci siano tutti i componenti attesi
+    for key in ('train', 'val', 'price_scaler', 'volume_scaler', 'feature_scaler'):
+        assert key in loaders
+    assert len(loaders['val']) > 0
+    
+    # Gli scaler restituiti sono quelli dell'unico fit sul training set
+    train_dataset = loaders['train'].dataset
+    assert loaders['price_scaler'] is train_dataset.price_scaler
+    assert loaders['feature_scaler'] is train_dataset.feature_scaler
+    
+    # Test dimensioni batch
+    x, y = first_batch
+    assert x.shape[0] == 32  # batch size
+    assert x.shape[1] == 60  # sequence length
+    assert y.shape[1] == 5   # prediction horizon
+    
+    # Batch float32 contigui: niente copie prima dei matmul
+    assert x.dtype == torch.float32
+    assert x.is_contiguous()
+    
+    # Override dei test applicati; di default un dataset piccolo non usa worker
+    assert loaders['train'].num_workers == 0
+    assert not loaders['train'].pin_memory
+    assert DataPipeline._num_workers(len(loaders['train'].dataset)) == 0
+
+def test_loader_overrides_replace_defaults(pipeline, featured):
+    """Override di argomenti gia' impostati da prepare_data: nessun doppio keyword"""
+    overrides = {**_TEST_LOADER_KWARGS, 'batch_size': 8, 'shuffle': False}
+    loaders = pipeline.prepare_data(featured, loader_kwargs=overrides)
+    
+    assert loaders['train'].batch_size == loaders['val'].batch_size == 8
+    assert isinstance(loaders['train'].sampler, torch.utils.data.SequentialSampler)
+    x, _ = next(iter(loaders['train']))
+    assert torch.equal(x, loaders['train'].dataset[:8][0])
+
+def test_scaling(loaders):
+    """Test che lo scaling funzioni correttamente"""
+    # Prime 32 finestre direttamente dal dataset in memoria, senza
+    # sampler, shuffle e collate del DataLoader
+    x, _ = loaders['train'].dataset[:32]
+    
+    # Verifica che i dati siano scalati (media ≈ 0, std ≈ 1)
+    # Un solo trasferimento verso l'host per entrambe le statistiche
+    std, mean = torch.stack(torch.std_mean(x)).tolist()
+    assert -1 < mean < 1 and 0.5 < std < 1.5
+
+def test_windows_match_slices(featured):
+    """Le finestre strided coincidono con lo slicing diretto dei dati"""
+    dataset = TradingDataset(featured, sequence_length=60, prediction_horizon=5)
+    
+    for idx in (0, len(dataset) // 2, len(dataset) - 1):
+        x, y = dataset[idx]
+        assert torch.equal(x, dataset.data[idx:idx + 60])
+        assert torch.equal(y, dataset.data[idx + 60:idx + 65, 0])
+
+def test_rolling_rsi_matches_pandas():
+    """Il kernel RSI coincide con il rolling di pandas, finestre piatte incluse"""
+    close = _make_test_data()['close'].to_numpy(dtype=np.float64)
+    close[100:130] = close[100]
+
+    delta = pd.Series(close).diff()
+    gain = delta.where(delta > 0, 0).rolling(window=14).mean()
+    loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
+    expected = (100 - 100 / (1 + gain / loss)).to_numpy()
+
+    rsi = _rolling_rsi(close, 14)
+    # Prima barra esclusa: pandas conta il delta mancante come zero
+    np.testing.assert_allclose(rsi[14:], expected[14:], rtol=1e-9, equal_nan=True)
+    assert np.isnan(rsi[128])
+
+@pytest.mark.skipif(not os.environ.get('TA_BENCH'), reason='imposta TA_BENCH per il test su dataset grande')
+def test_pipeline_large(pipeline):
+    """Pipeline completa su un dataset di dimensione realistica"""
+    featured = pipeline.add_technical_features(_make_test_data(max(PERIODS, 5000)))
+    assert not _frame_has_nan(featured)
+    loaders = pipeline.prepare_data(featured, loader_kwargs=_TEST_LOADER_KWARGS)
     
-    def test_data_preparation(self):
-        """Test preparazione dei data loader"""
-        data = self.pipeline.add_technical_features(self.test_data)
-        loaders = self.pipeline.prepare_data(data)
-        
-        # Verifica che ci siano tutti i componenti attesi
-        self.assertIn('train', loaders)
-        self.assertIn('val', loaders)
-        self.assertIn('price_scaler', loaders)
-        self.assertIn('volume_scaler', loaders)
-        self.assertIn('feature_scaler', loaders)
-        
-        # Test dimensioni batch
-        x, y = next(iter(loaders['train']))
-        self.assertEqual(x.shape[0], 32)  # batch size
-        self.assertEqual(x.shape[1], 60)  # sequence length
-        self.assertEqual(y.shape[1], 5)   # prediction horizon
-
-    def test_scaling(self):
-        """Test che lo scaling funzioni correttamente"""
-        data = self.pipeline.add_technical_features(self.test_data)
-        loaders = self.pipeline.prepare_data(data)
-        
-        # Prendi un batch
-        x, _ = next(iter(loaders['train']))
-        
-        # Verifica che i dati siano scalati (media ≈ 0, std ≈ 1)
-        self.assertTrue(-1 < x.mean() < 1)
-        self.assertTrue(0.5 < x.std() < 1.5)
-
-if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    n_batches = 0
+    for x, y in loaders['train']:
+        assert x.shape[1] == 60
+        assert y.shape[1] == 5
+        n_batches += 1
+    assert n_batches == len(loaders['train'])
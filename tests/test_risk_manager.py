@@ -0,0 +1,115 @@
+"""
+Test suite for the risk manager
+"""
+import unittest
+from unittest import mock
+import numpy as np
+from src.risk.manager import RiskManager
+
+class TestRiskManager(unittest.TestCase):
+    def setUp(self):
+        self.manager = RiskManager({})
+        self.rng = np.random.default_rng(0)
+
+    def test_correlation_risk_matches_pairwise(self):
+        """La matrice unica coincide con np.corrcoef coppia per coppia"""
+        base = self.rng.standard_normal(100)
+        returns = {
+            'BTC': base,
+            'ETH': base + 0.1 * self.rng.standard_normal(100),
+            'SOL': self.rng.standard_normal(100)
+        }
+        result = self.manager.calculate_correlation_risk(returns)
+        
+        self.assertEqual(list(result['correlations']), ['BTC-ETH', 'BTC-SOL', 'ETH-SOL'])
+        for key, corr in result['correlations'].items():
+            a, b = key.split('-')
+            self.assertAlmostEqual(corr, np.corrcoef(returns[a], returns[b])[0, 1])
+        self.assertEqual([p[:2] for p in result['high_correlation_pairs']], [('BTC', 'ETH')])
+        
+        single = self.manager.calculate_correlation_risk({'BTC': base})
+        self.assertEqual(single['correlations'], {})
+
+    def test_broker_risk_limits_are_read_only(self):
+        """Limiti broker in sola lettura, anche quelli annidati"""
+        limits = self.manager.get_broker_risk_limits('binance')
+        self.assertEqual(limits['max_leverage'], 20)
+        self.assertEqual(dict(limits), {'max_leverage': 20, 'min_notional': 10, 'max_orders': 100})
+        with self.assertRaises(TypeError):
+            limits['max_leverage'] = 50
+        with self.assertRaises(TypeError):
+            self.manager.BROKER_LIMITS['binance'] = {}
+
+        unknown = self.manager.get_broker_risk_limits('unknown')
+        self.assertEqual(len(unknown), 0)
+        with self.assertRaises(TypeError):
+            unknown['max_leverage'] = 1
+
+        # Una copia resta modificabile senza toccare la costante condivisa
+        copy = dict(limits)
+        copy['max_leverage'] = 50
+        self.assertEqual(self.manager.get_broker_risk_limits('binance')['max_leverage'], 20)
+
+    def test_portfolio_heat_map_buckets(self):
+        """Soglie 10% e 20% escluse come nel confronto scalare (> 0.2, > 0.1)"""
+        positions = {'BTC': {'value': 50.0}, 'ETH': {'value': 20.0}, 'SOL': {'value': 15.0},
+                     'ADA': {'value': 10.0}, 'XRP': {'value': 5.0}}
+        heat_map = self.manager.generate_portfolio_heat_map(positions)
+        self.assertEqual(heat_map, {'high_risk': ['BTC'], 'medium_risk': ['ETH', 'SOL'],
+                                    'low_risk': ['ADA', 'XRP']})
+        self.assertEqual(self.manager.generate_portfolio_heat_map({}),
+                         {'high_risk': [], 'medium_risk': [], 'low_risk': []})
+
+    def test_max_drawdown(self):
+        """Drawdown massimo dal picco, riusato dal rendimento aggiustato"""
+        trades = [{'capital': c} for c in (100.0, 120.0, 90.0, 130.0, 117.0)]
+        max_dd = self.manager._calculate_max_drawdown(trades)
+        self.assertAlmostEqual(max_dd, 25.0)
+        self.assertAlmostEqual(self.manager._calculate_risk_adjusted_return(trades), 0.17 / 0.25)
+        self.assertAlmostEqual(
+            self.manager._calculate_risk_adjusted_return(trades, max_dd), 0.17 / 0.25
+        )
+
+    def test_sharpe_ratio_matches_numpy(self):
+        """Il kernel Sharpe coincide con media/std numpy dei rendimenti"""
+        capitals = 1000 * np.cumprod(1 + self.rng.normal(0, 0.01, 300))
+        returns = np.diff(capitals) / capitals[:-1]
+        trades = [{'capital': c} for c in capitals]
+        self.assertAlmostEqual(self.manager._calculate_sharpe_ratio(trades),
+                               returns.mean() / returns.std() * np.sqrt(252))
+        self.assertEqual(self.manager._calculate_sharpe_ratio(trades[:1]), 0.0)
+
+    def test_market_regime_uses_rolling_windows(self):
+        """Picco finale di volatilità e volume -> regime high_risk"""
+        prices = np.r_[100 + 0.1 * self.rng.standard_normal(200),
+                       100 + 5 * self.rng.standard_normal(20)]
+        volumes = np.r_[np.full(219, 1000.0), 5000.0]
+        regime = self.manager.detect_market_regime(prices, volumes)
+        self.assertEqual(regime['regime'], 'high_risk')
+        self.assertAlmostEqual(regime['volatility'], np.std(prices[-20:]))
+        self.assertAlmostEqual(regime['volume_ratio'], 5000.0 / np.mean(volumes[-20:]))
+
+    def test_backtest_matches_sequential_loop(self):
+        """La traiettoria vettoriale del capitale coincide con il loop trade per trade"""
+        prices = 100 + self.rng.standard_normal(50).cumsum()
+        scores = self.rng.uniform(20, 90, 50)
+        historical = {
+            f'd{i}': {'market': {}, 'sentiment': {}, 'portfolio': {},
+                      'price': prices[i], 'next_price': prices[i + 1]}
+            for i in range(49)
+        }
+        
+        with mock.patch.object(self.manager, 'calculate_risk_score',
+                               side_effect=[{'score': s} for s in scores[:49]]):
+            results = self.manager.backtest_risk_strategy(historical, {'initial_capital': 1000})
+        
+        capital = 1000.0
+        for i, trade in enumerate(results['trades']):
+            size = capital * 0.02 / (prices[i] * 0.05) * scores[i] / 100
+            capital += size * (prices[i + 1] - prices[i])
+            self.assertAlmostEqual(trade['position_size'], size)
+            self.assertAlmostEqual(trade['capital'], capital)
+        self.assertAlmostEqual(results['metrics']['final_capital'], capital)
+
+if __name__ == '__main__':
+    unittest.main()
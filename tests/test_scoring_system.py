@@ -0,0 +1,273 @@
+"""
+Test suite for scoring system kernels
+"""
+import asyncio
+import unittest
+from unittest import mock
+import numpy as np
+import torch
+from src.analysis.scoring_system import (
+    SignalScorer, _BarStream, _batch_combine, _batch_technical_scores, _combine_kernel,
+    _rsi_njit, _tech_score_kernel, _technical_score_njit
+)
+
+
+def _reference_rsi(prices: np.ndarray, period: int = 14) -> float:
+    deltas = np.diff(prices)
+    gain = np.where(deltas > 0, deltas, 0)
+    loss = np.where(deltas < 0, -deltas, 0)
+    avg_loss = np.mean(loss[-period:])
+    if avg_loss == 0:
+        return 100.0
+    return 100 - (100 / (1 + np.mean(gain[-period:]) / avg_loss))
+
+
+class TestScoringKernels(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(42)
+        self.prices = rng.standard_normal(200).cumsum() + 100
+        self.volumes = rng.integers(1000, 10000, 200).astype(np.float64)
+
+    def test_rsi_matches_reference(self):
+        """Il kernel RSI coincide con l'implementazione numpy"""
+        for period in (5, 14, 30):
+            self.assertAlmostEqual(
+                _rsi_njit(self.prices, period),
+                _reference_rsi(self.prices, period)
+            )
+
+    def test_rsi_no_losses(self):
+        """Serie solo crescente -> RSI 100"""
+        self.assertEqual(_rsi_njit(np.arange(30, dtype=np.float64), 14), 100.0)
+
+    def test_tech_score_kernel_matches_numpy(self):
+        """Il kernel fuso restituisce gli stessi valori dei passaggi separati"""
+        rsi, vol_avg, vol_current, sma_20, sma_50 = _tech_score_kernel(
+            self.prices, self.volumes
+        )
+        self.assertAlmostEqual(rsi, _reference_rsi(self.prices))
+        self.assertAlmostEqual(vol_avg, np.mean(self.volumes[-20:]))
+        self.assertEqual(vol_current, self.volumes[-1])
+        self.assertAlmostEqual(sma_20, np.mean(self.prices[-20:]))
+        self.assertAlmostEqual(sma_50, np.mean(self.prices[-50:]))
+
+    def test_combine_kernel(self):
+        """Confidence bassa -> WAIT senza livelli, segnale forte -> BUY"""
+        action, _, target, stop_loss, _, size = _combine_kernel(
+            100.0, 110.0, 0.5, 0.02, 1.0, 100.0, 0.7, 2.0, 0.02
+        )
+        self.assertEqual(action, 0)
+        self.assertTrue(np.isnan(target) and np.isnan(stop_loss))
+        self.assertEqual(size, 0.0)
+
+        action, score, target, stop_loss, risk_reward, size = _combine_kernel(
+            100.0, 110.0, 0.9, 0.02, 1.0, 100.0, 0.7, 2.0, 0.02
+        )
+        self.assertEqual(action, 1)
+        self.assertAlmostEqual(score, 0.97)
+        self.assertAlmostEqual(stop_loss, 98.0)
+        self.assertAlmostEqual(target, 104.0)
+        self.assertAlmostEqual(risk_reward, 2.0)
+        self.assertAlmostEqual(size, 1.0)
+
+    def test_bar_stream_matches_window_means(self):
+        """Le somme incrementali coincidono con le medie sulle finestre"""
+        stream = _BarStream()
+        stream.seed(self.prices[:60], self.volumes[:60])
+        for i in range(60, len(self.prices)):
+            stream.push(self.prices[i], self.volumes[i])
+            if i in (60, 99, 137, len(self.prices) - 1):
+                self.assertTrue(stream.warm)
+                self.assertAlmostEqual(stream.sum20 / 20, np.mean(self.prices[i - 19:i + 1]))
+                self.assertAlmostEqual(stream.sum50 / 50, np.mean(self.prices[i - 49:i + 1]))
+                self.assertAlmostEqual(stream.vol_sum / 20, np.mean(self.volumes[i - 19:i + 1]))
+
+    def test_bar_stream_seed_matches_push(self):
+        """Il seed da slice produce lo stesso stato del push barra per barra"""
+        for end in (5, 20, 33, 50, 120):
+            seeded = _BarStream()
+            seeded.seed(self.prices[:end], self.volumes[:end])
+            pushed = _BarStream()
+            for price, volume in zip(self.prices[max(end - 50, 0):end],
+                                     self.volumes[max(end - 50, 0):end]):
+                pushed.push(price, volume)
+            self.assertEqual(seeded.count, pushed.count)
+            self.assertEqual(seeded.last, pushed.last)
+            self.assertAlmostEqual(seeded.sum20, pushed.sum20)
+            self.assertAlmostEqual(seeded.sum50, pushed.sum50)
+            self.assertAlmostEqual(seeded.vol_sum, pushed.vol_sum)
+            seeded.push(self.prices[end], self.volumes[end])
+            pushed.push(self.prices[end], self.volumes[end])
+            self.assertAlmostEqual(seeded.sum20, pushed.sum20)
+            self.assertAlmostEqual(seeded.vol_sum, pushed.vol_sum)
+
+    def test_batch_kernels_match_single_symbol(self):
+        """I kernel batch coincidono con il calcolo simbolo per simbolo"""
+        rng = np.random.default_rng(7)
+        prices = rng.standard_normal((6, 80)).cumsum(axis=1) + 100
+        volumes = rng.integers(1000, 10000, (6, 80)).astype(np.float64)
+
+        technical = _batch_technical_scores(prices, volumes)
+        for s in range(6):
+            expected = _technical_score_njit(
+                prices[s, -1], *_tech_score_kernel(prices[s], volumes[s])
+            )
+            self.assertAlmostEqual(technical[s], expected)
+
+        predicted = prices[:, -1] * (1 + rng.normal(0, 0.05, 6))
+        confidence = rng.random(6)
+        volatility = rng.random(6) * 0.05 + 1e-3
+        risk = rng.random(6) * 100
+        actions = np.empty(6, dtype=np.int64)
+        values = np.empty((6, 5))
+        _batch_combine(prices[:, -1], predicted, confidence, volatility, technical,
+                       risk, 0.7, 2.0, 0.02, actions, values)
+        for s in range(6):
+            expected = _combine_kernel(prices[s, -1], predicted[s], confidence[s],
+                                       volatility[s], technical[s], risk[s],
+                                       0.7, 2.0, 0.02)
+            self.assertEqual(actions[s], expected[0])
+            np.testing.assert_allclose(values[s], expected[1:])
+
+def _fake_forward(x):
+    """Output del transformer con le shape reali (B, prediction_horizon)"""
+    ones = torch.ones(x.shape[0], 5)
+    return {
+        'price_predictions': ones,
+        'confidence_scores': ones * 0.9,
+        'volatility_estimates': ones * 0.01
+    }
+
+class TestSignalScorer(unittest.TestCase):
+    def test_low_technical_score_skips_transformer(self):
+        """Score tecnico sotto soglia -> WAIT senza forward del transformer"""
+        scorer = SignalScorer(skip_transformer_below=1.1)
+        rng = np.random.default_rng(3)
+        prices = rng.standard_normal(100).cumsum() + 100
+        volumes = rng.integers(1000, 10000, 100).astype(np.float64)
+
+        with mock.patch.object(scorer.transformer, 'forward') as forward:
+            result = asyncio.run(scorer.generate_signal('BTCUSDT', prices, volumes))
+
+        forward.assert_not_called()
+        self.assertEqual(result.signal.action, 'WAIT')
+        self.assertIsNone(result.analysis.transformer_confidence)
+        self.assertEqual(result.to_dict()['signal'], 'WAIT')
+
+    def test_stream_follows_bars(self):
+        """Chiamate ripetute sulla stessa barra non spostano le medie del buffer"""
+        scorer = SignalScorer(skip_transformer_below=1.1)
+        rng = np.random.default_rng(5)
+        prices = rng.standard_normal(120).cumsum() + 100
+        volumes = rng.integers(1000, 10000, 120).astype(np.float64)
+
+        def score(end, ts):
+            result = asyncio.run(scorer.generate_signal(
+                'BTCUSDT', prices[:end], volumes[:end], bar_timestamp=ts
+            ))
+            expected = _technical_score_njit(
+                prices[end - 1], *_tech_score_kernel(prices[:end], volumes[:end])
+            )
+            self.assertAlmostEqual(result.analysis.technical_score, expected)
+            stream = scorer._streams['BTCUSDT']
+            self.assertAlmostEqual(stream.sum20 / 20, np.mean(prices[end - 20:end]))
+            self.assertAlmostEqual(stream.vol_sum / 20, np.mean(volumes[end - 20:end]))
+
+        # Stessa barra due volte, barra successiva, barre saltate
+        score(80, 79)
+        score(80, 79)
+        score(81, 80)
+        score(90, 89)
+        score(91, 90)
+        self.assertEqual(scorer._streams['BTCUSDT'].last_bar, 90)
+
+        # Aggiornamento parziale della barra 90: kernel sulla coda, buffer invariato
+        stream = scorer._streams['BTCUSDT']
+        partial = prices[:91].copy()
+        partial[-1] += 1.0
+        self.assertIsNone(scorer._get_stream('BTCUSDT', partial, volumes[:91], 90))
+        self.assertIs(scorer._streams['BTCUSDT'], stream)
+        self.assertAlmostEqual(stream.last[0], prices[90])
+
+    def test_predict_memoizes_forward(self):
+        """Stessa coda di prezzi -> un solo forward; cache LRU limitata"""
+        scorer = SignalScorer(sequence_length=10, forward_cache_size=2)
+        prices = np.linspace(100.0, 110.0, 50)
+        volumes = np.full(50, 1000.0)
+
+        with mock.patch.object(scorer.transformer, 'forward', side_effect=_fake_forward) as forward:
+            prediction = scorer._predict(prices, volumes)
+            scorer._predict(prices.copy(), volumes.copy())
+            self.assertEqual(forward.call_count, 1)
+            self.assertEqual(tuple(forward.call_args[0][0].shape), (1, 10, 10))
+            self.assertEqual(prediction['price_predictions'].shape, (5,))
+
+            scorer._predict(prices, volumes, bar_timestamp=1)
+            scorer._predict(prices + 1, volumes)
+            self.assertEqual(forward.call_count, 3)
+            self.assertEqual(len(scorer._fwd_cache), 2)
+
+    def test_placeholder_input_layout(self):
+        """Input segnaposto: solo prezzo e volume, z-score sulla finestra"""
+        scorer = SignalScorer()
+        prices = np.linspace(100.0, 110.0, 20)
+        volumes = np.linspace(1000.0, 2000.0, 20)
+
+        x, price_mean, price_std = scorer._placeholder_input(prices, volumes)
+
+        self.assertEqual(x.shape, (1, 20, scorer.transformer.input_size))
+        self.assertFalse(x[0, :, 2:].any())
+        np.testing.assert_allclose(x[0, :, 0] * price_std + price_mean, prices, rtol=1e-5)
+        self.assertAlmostEqual(float(x[0, :, 1].mean()), 0.0, places=5)
+
+    def test_batch_signals_end_to_end(self):
+        """Batch su transformer e risk manager reali, salvo il forward"""
+        scorer = SignalScorer(skip_transformer_below=0.0)
+        rng = np.random.default_rng(11)
+        prices = rng.standard_normal((3, 80)).cumsum(axis=1) + 100
+        volumes = rng.integers(1000, 10000, (3, 80)).astype(np.float64)
+        symbols = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
+
+        with mock.patch.object(scorer.transformer, 'forward', side_effect=_fake_forward):
+            results = asyncio.run(scorer.generate_signals_batch(symbols, prices, volumes))
+
+        self.assertEqual([r.symbol for r in results], symbols)
+        for s, result in enumerate(results):
+            self.assertIn(result.signal.action, ('WAIT', 'BUY', 'SELL'))
+            self.assertAlmostEqual(result.analysis.transformer_confidence, 0.9)
+            self.assertTrue(0 <= result.analysis.risk_score <= 100)
+            # Previsione denormalizzata: un punto di z-score sopra la media
+            window = prices[s, -scorer.sequence_length:]
+            self.assertAlmostEqual(
+                scorer._predict(prices[s], volumes[s])['price_predictions'][-1],
+                window.mean() + window.std(), places=4
+            )
+
+    def test_batch_skips_low_technical_score(self):
+        """Nel batch i simboli sotto soglia sono WAIT senza forward"""
+        rng = np.random.default_rng(13)
+        prices = rng.standard_normal((6, 80)).cumsum(axis=1) + 100
+        volumes = rng.integers(1000, 10000, (6, 80)).astype(np.float64)
+        technical = _batch_technical_scores(prices, volumes)
+        threshold = np.median(technical)
+        scorer = SignalScorer(skip_transformer_below=threshold)
+        symbols = [f'S{s}' for s in range(6)]
+
+        with mock.patch.object(scorer.transformer, 'forward', side_effect=_fake_forward) as forward:
+            results = asyncio.run(scorer.generate_signals_batch(symbols, prices, volumes))
+
+        skipped = technical < threshold
+        self.assertTrue(skipped.any() and not skipped.all())
+        self.assertEqual(forward.call_count, int((~skipped).sum()))
+        for s, result in enumerate(results):
+            self.assertEqual(result.symbol, symbols[s])
+            self.assertAlmostEqual(result.analysis.technical_score, technical[s])
+            if skipped[s]:
+                self.assertEqual(result.signal.action, 'WAIT')
+                self.assertIsNone(result.analysis.transformer_confidence)
+                self.assertIsNone(result.analysis.risk_score)
+            else:
+                self.assertIsNotNone(result.analysis.risk_score)
+
+if __name__ == '__main__':
+    unittest.main()
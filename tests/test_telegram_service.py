@@ -0,0 +1,121 @@
+"""
+Test suite for the Telegram notification service
+"""
+import asyncio
+import unittest
+from unittest import mock
+from src.services.telegram_service import TelegramService
+
+
+def _signal(symbol: str) -> dict:
+    return {
+        'symbol': symbol,
+        'signal': 'BUY',
+        'current_price': 100.0,
+        'target_price': 104.0,
+        'stop_loss': 98.0,
+        'confidence': 0.9,
+        'risk_reward': 2.0,
+        'position_size': 1.0
+    }
+
+
+def _callback(data: str) -> mock.Mock:
+    """Update con una callback_query che registra le risposte"""
+    query = mock.Mock(data=data)
+    query.answer = mock.AsyncMock()
+    query.edit_message_text = mock.AsyncMock()
+    return mock.Mock(callback_query=query)
+
+
+class TestTelegramService(unittest.TestCase):
+    def setUp(self):
+        with mock.patch.object(TelegramService, 'setup_bot'):
+            self.service = TelegramService()
+        self.service.app = mock.Mock()
+        self.service.app.bot.send_message = mock.AsyncMock()
+
+    def _send(self, signal: dict) -> str:
+        """Invia un segnale e restituisce l'ID ordine registrato"""
+        self.assertTrue(asyncio.run(self.service.send_trade_signal(signal)))
+        return next(reversed(self.service.pending_orders))
+
+    def test_order_ids_are_unique(self):
+        """Prefisso del processo + contatore: ID distinti anche tra istanze"""
+        async def send_all():
+            return await asyncio.gather(
+                *(self.service.send_trade_signal(_signal(f'S{i}')) for i in range(50))
+            )
+
+        self.assertTrue(all(asyncio.run(send_all())))
+        order_ids = list(self.service.pending_orders)
+        self.assertEqual(len(set(order_ids)), 50)
+        self.assertTrue(all(oid.startswith(self.service._order_prefix) for oid in order_ids))
+
+        with mock.patch.object(TelegramService, 'setup_bot'):
+            other = TelegramService()
+        self.assertNotEqual(other._order_prefix, self.service._order_prefix)
+
+    def test_callback_pops_order(self):
+        """Il bottone consuma l'ordine; un secondo click trova l'ordine gia' gestito"""
+        order_id = self._send(_signal('BTCUSDT'))
+        buttons = self.service._create_approval_keyboard(order_id).inline_keyboard[0]
+        self.assertEqual([b.callback_data for b in buttons],
+                         [f'approve_{order_id}', f'reject_{order_id}'])
+
+        update = _callback(f'approve_{order_id}')
+        asyncio.run(self.service._button_callback(update, None))
+        update.callback_query.edit_message_text.assert_awaited_once()
+        self.assertNotIn(order_id, self.service.pending_orders)
+
+        again = _callback(f'reject_{order_id}')
+        asyncio.run(self.service._button_callback(again, None))
+        again.callback_query.answer.assert_awaited_once_with("Order expired or already processed")
+        again.callback_query.edit_message_text.assert_not_awaited()
+
+    def test_expired_orders_are_evicted(self):
+        """Scaduto il TTL l'ordine lascia la memoria; il click tardivo non esegue"""
+        self.service.order_ttl = 60.0
+        with mock.patch('src.services.telegram_service.time') as clock:
+            clock.monotonic.return_value = 1000.0
+            old_id = self._send(_signal('BTCUSDT'))
+            clock.monotonic.return_value = 1030.0
+            new_id = self._send(_signal('ETHUSDT'))
+            self.assertEqual(list(self.service.pending_orders), [old_id, new_id])
+
+            # Il primo ordine scade al prossimo invio, il secondo resta
+            clock.monotonic.return_value = 1060.0
+            latest_id = self._send(_signal('SOLUSDT'))
+            self.assertEqual(list(self.service.pending_orders), [new_id, latest_id])
+            self.assertEqual([oid for _, oid in self.service._order_expiry], [new_id, latest_id])
+
+            # Click arrivato dopo la scadenza: risposta e nessuna esecuzione
+            clock.monotonic.return_value = 1090.0
+            update = _callback(f'approve_{new_id}')
+            asyncio.run(self.service._button_callback(update, None))
+            update.callback_query.answer.assert_awaited_once_with("Order expired or already processed")
+            update.callback_query.edit_message_text.assert_not_awaited()
+            self.assertEqual(list(self.service.pending_orders), [latest_id])
+
+            late = _callback(f'approve_{old_id}')
+            asyncio.run(self.service._button_callback(late, None))
+            late.callback_query.answer.assert_awaited_once_with("Order expired or already processed")
+
+    def test_send_trade_signals_reports_each_result(self):
+        """Invii paralleli: un errore non maschera l'esito degli altri segnali"""
+        async def send_message(chat_id, text, reply_markup, parse_mode):
+            if 'ETHUSDT' in text:
+                raise RuntimeError('network down')
+
+        self.service.app.bot.send_message = mock.AsyncMock(side_effect=send_message)
+        malformed = {'symbol': 'XRPUSDT'}  # campi mancanti: KeyError nel formato
+        signals = [_signal('BTCUSDT'), _signal('ETHUSDT'), malformed, _signal('SOLUSDT')]
+
+        results = asyncio.run(self.service.send_trade_signals(signals))
+
+        self.assertEqual(results, [True, False, False, True])
+        self.assertEqual(self.service.app.bot.send_message.await_count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+"""
+Test suite for the Transformer model
+"""
+import unittest
+import torch
+from src.models.transformer import TradingTransformer
+
+class TestTradingTransformer(unittest.TestCase):
+    def setUp(self):
+        torch.manual_seed(0)
+        self.model = TradingTransformer(input_size=10, d_model=64, nhead=4, num_layers=2)
+        self.model.eval()
+        self.x = torch.randn(3, 60, 10)
+
+    def test_forward_shapes(self):
+        """Ogni head restituisce (batch, prediction_horizon)"""
+        with torch.no_grad():
+            out = self.model(self.x)
+        for key in ('price_predictions', 'confidence_scores', 'volatility_estimates'):
+            self.assertEqual(out[key].shape, (3, 5))
+        self.assertTrue(((out['confidence_scores'] >= 0) & (out['confidence_scores'] <= 1)).all())
+        self.assertTrue((out['volatility_estimates'] >= 0).all())
+
+    def test_default_leaves_tf32_flags(self):
+        """Costruire il modello non cambia i flag TF32 globali"""
+        matmul, cudnn = torch.backends.cuda.matmul.allow_tf32, torch.backends.cudnn.allow_tf32
+        try:
+            torch.backends.cuda.matmul.allow_tf32 = False
+            torch.backends.cudnn.allow_tf32 = False
+            TradingTransformer(input_size=10, d_model=64, nhead=4, num_layers=1)
+            self.assertFalse(torch.backends.cuda.matmul.allow_tf32)
+            self.assertFalse(torch.backends.cudnn.allow_tf32)
+        finally:
+            torch.backends.cuda.matmul.allow_tf32 = matmul
+            torch.backends.cudnn.allow_tf32 = cudnn
+
+    def test_cached_buffers(self):
+        """Mask causale e position encoding sono buffer non persistenti"""
+        buffers = dict(self.model.named_buffers())
+        self.assertIn('causal_mask', buffers)
+        self.assertIn('position_encoding', buffers)
+        self.assertNotIn('causal_mask', self.model.state_dict())
+        
+        mask = self.model.causal_mask[:4, :4]
+        self.assertTrue(torch.equal(mask, torch.triu(torch.ones(4, 4, dtype=torch.bool), diagonal=1)))
+
+    def test_encoder_is_causal(self):
+        """Modificare l'ultimo step non cambia l'encoding dei precedenti"""
+        model = self.model
+        mask = model.causal_mask[:60, :60]
+        perturbed = self.x.clone()
+        perturbed[:, -1] += 1.0
+        with torch.no_grad():
+            a = model.transformer_encoder(model.embed_features(self.x), mask=mask, is_causal=True)
+            b = model.transformer_encoder(model.embed_features(perturbed), mask=mask, is_causal=True)
+        self.assertTrue(torch.allclose(a[:, :-1], b[:, :-1], atol=1e-5))
+        self.assertFalse(torch.allclose(a[:, -1], b[:, -1]))
+
+    def test_trading_signal_batch(self):
+        """Segnali calcolati sull'intero batch, HOLD senza confidence alta"""
+        predictions = {
+            'price_predictions': torch.tensor([[100., 120., 90., 1., 1.], [80., 80., 80., 80., 80.],
+                                               [100., 100., 100., 100., 100.]]),
+            'confidence_scores': torch.tensor([[0.1, 0.9, 0.95, 0., 0.], [0.8] * 5, [0.1] * 5]),
+            'volatility_estimates': torch.full((3, 5), 0.01)
+        }
+        signals = self.model.get_trading_signals(predictions, torch.tensor([100., 100., 100.]))
+        self.assertEqual([s['signal'] for s in signals], ['BUY', 'SELL', 'HOLD'])
+        self.assertEqual(signals[0]['prediction_minutes_ahead'], 2)
+        self.assertEqual(signals[0]['target_price'], 120.0)
+        self.assertEqual(signals[2], {'signal': 'HOLD', 'confidence': 0.0, 'target_price': 100.0})
+        
+        # Un batch di un elemento resta una lista; get_trading_signal restituisce il dict
+        row = {k: v[1:2] for k, v in predictions.items()}
+        self.assertEqual(self.model.get_trading_signals(row, 100.0)[0]['signal'], 'SELL')
+        self.assertEqual(self.model.get_trading_signal(row, 100.0)['signal'], 'SELL')
+        with self.assertRaises(ValueError):
+            self.model.get_trading_signal(predictions, torch.tensor([100., 100., 100.]))
+
+if __name__ == '__main__':
+    unittest.main()